@@ -5,9 +5,9 @@
 # Пожалуйста, прочитайте документацию на RM3100!
 # Please read the RM3100 documentation!
 from machine import I2C, Pin
-import math
 import rm3100mod
 import time
+from sensor_pack import geomath
 from sensor_pack.bus_service import I2cAdapter
 
 if __name__ == '__main__':
@@ -25,6 +25,10 @@ if __name__ == '__main__':
     # i2c = I2C(id=1, scl=Pin(27), sda=Pin(26), freq=400_000)  # on Arduino Nano RP2040 Connect and Pico W tested!
     i2c = I2C(id=1, scl=Pin(7), sda=Pin(6), freq=400_000)  # create I2C peripheral at frequency of 400kHz
     adapter = I2cAdapter(i2c)  # адаптер для стандартного доступа к шине
+    # Для шины SPI (вывод SSN/CS датчика подключен к выводу MCU, вывод I2CEN датчика к GND):
+    # spi = SPI(0, baudrate=1_000_000, polarity=0, phase=0, sck=Pin(18), mosi=Pin(19), miso=Pin(16))
+    # adapter = SpiAdapter(spi)
+    # sensor = rm3100mod.RM3100(adapter, address=Pin(17, Pin.OUT, value=1))
     
     A = "XYZ"
     sensor = rm3100mod.RM3100(adapter)
@@ -42,21 +46,22 @@ if __name__ == '__main__':
     sensor.start_measure(axis=A, update_rate=upd_rate, single_mode=True)
     print(f"Is continuous meas mode: {sensor.is_continuous_meas_mode()}")
     print("Single meas mode measurement")
-    wt = rm3100mod.get_conversion_cycle_time(upd_rate)
-    delay_func = time.sleep_us
-    delay_func(wt)
-    if sensor.is_data_ready():
+    # ожидание окончания измерения: сон до расчетного времени окончания, затем короткий опрос STATUS
+    if sensor.wait_meas():
         for axis in A:
             print(f"{axis} axis magnetic field value: {sensor.get_meas_result(axis)}")
 
     print("Continuous meas mode measurement")
     sensor.start_measure(axis=A, update_rate=upd_rate, single_mode=False)
+    # период измерений: период TMRC, но не меньше времени измерения по всем осям
+    wt = max(rm3100mod.get_conversion_cycle_time(upd_rate), sensor.get_meas_time())
+    delay_func = time.sleep_us
     print(f"Is continuous meas mode: {sensor.is_continuous_meas_mode()}")
     for mag_field_comp in sensor:
         delay_func(wt)
         if mag_field_comp:
             # напряженность магнитного поля в условных ед.
-            mfs = math.sqrt(sum(map(lambda val: val ** 2, mag_field_comp)))
+            mfs = geomath.magnitude(*mag_field_comp)
             print(f"X: {mag_field_comp[0]}; Y: {mag_field_comp[1]}; Z: {mag_field_comp[2]}; mag field strength: {mfs}")
     # end
     # min_vals = [2**31 for i in range(3)]
@@ -0,0 +1,243 @@
+"""Двоичный формат записи результатов измерений RM3100.
+Binary log format for RM3100 measurement results.
+
+Файл состоит из заголовка (HEADER_SIZE байт) и записей фиксированной длины.
+Заголовок (little endian): сигнатура b"RM3L", версия, формат записей, адрес датчика (0xFF - SPI), TMRC,
+CCR X, Y, Z, длина записи.
+Записи:
+    FORMAT_INT24 - метка времени ticks_us() (uint32 little endian) + X, Y, Z (int24 big endian, как в регистрах
+                   MX..MZ датчика), 13 байт;
+    FORMAT_INT32 - метка времени ticks_us() (uint32) + X, Y, Z (int32), все little endian, 16 байт.
+
+Запись (MicroPython и CPython):
+    with open("mag.bin", "wb") as f:
+        log = rm3100log.LogWriter(f, sensor)
+        n = sensor.read_into(samples, ticks=ticks)
+        log.put_block(samples, ticks, n)
+        log.flush()
+
+Чтение на ПК (CPython + NumPy), без копирования данных файла:
+    header, records = rm3100log.load("mag.bin")
+    xyz = rm3100log.get_xyz(records)"""
+# MicroPython
+# mail: goctaprog@gmail.com
+# MIT license
+import struct
+import rm3100mod
+from sensor_pack import int24
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"RM3L"
+VERSION = 1
+FORMAT_INT24 = 0
+FORMAT_INT32 = 1
+_RECORD_SIZES = (13, 16)
+
+_HEADER_FMT = "<4sBBBBHHHH16x"
+HEADER_SIZE = struct.calcsize(_HEADER_FMT)  # 32
+
+# адрес в заголовке для датчика на шине SPI
+ADDRESS_SPI = 0xFF
+
+
+class LogHeader:
+    """Заголовок файла записи: настройки датчика, при которых получены измерения."""
+
+    def __init__(self, record_format: int = FORMAT_INT24, address: int = ADDRESS_SPI, tmrc: int = 0x96,
+                 cycle_counts: tuple = (200, 200, 200)):
+        if record_format not in (FORMAT_INT24, FORMAT_INT32):
+            raise ValueError(f"Invalid record format: {record_format}")
+        self.record_format = record_format
+        self.address = address
+        self.tmrc = tmrc
+        self.cycle_counts = tuple(cycle_counts)
+
+    def get_record_size(self) -> int:
+        """Возвращает длину записи в байтах"""
+        return _RECORD_SIZES[self.record_format]
+
+    def get_config(self) -> rm3100mod.MeasConfig:
+        """Возвращает профиль настроек датчика (смотри RM3100.apply_config)"""
+        return rm3100mod.MeasConfig(cycle_counts=self.cycle_counts, update_rate=self.tmrc - 0x92)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack(_HEADER_FMT, MAGIC, VERSION, self.record_format, self.address, self.tmrc,
+                           *self.cycle_counts, self.get_record_size())
+
+    @staticmethod
+    def from_bytes(data) -> "LogHeader":
+        if len(data) < HEADER_SIZE:
+            raise ValueError(f"Header too short: {len(data)}")
+        magic, version, record_format, address, tmrc, ccx, ccy, ccz, rec_size = struct.unpack(
+            _HEADER_FMT, bytes(data[:HEADER_SIZE]))
+        if MAGIC != magic or VERSION != version:
+            raise ValueError(f"Unsupported log: {magic}, version {version}")
+        header = LogHeader(record_format, address, tmrc, (ccx, ccy, ccz))
+        if rec_size != header.get_record_size():
+            raise ValueError(f"Invalid record size: {rec_size}")
+        return header
+
+
+class LogWriter:
+    """Запись измерений в поток (файл) блоками по block_size байт. Размер блока рекомендуется выбирать равным
+    размеру страницы (сектора) flash памяти, чтобы каждая запись в файловую систему была целой страницей.
+    Записи могут переходить через границу блока. Использует только заранее выделенные буферы.
+    Writes measurements to a stream in blocks of block_size bytes (a flash page). No per-record allocation."""
+
+    def __init__(self, stream, sensor: rm3100mod.RM3100 = None, packed: bool = True, block_size: int = 4096,
+                 header: LogHeader = None):
+        """stream - поток, открытый для записи в двоичном режиме.
+        sensor - датчик, настройки которого записываются в заголовок (одна транзакция по шине).
+        packed - если Истина, то значения записываются как int24 (13 байт на запись), иначе как int32 (16 байт).
+        header - готовый заголовок (если sensor равен None)."""
+        if block_size < 16:
+            raise ValueError(f"Invalid block size: {block_size}")
+        if header is None:
+            record_format = FORMAT_INT24 if packed else FORMAT_INT32
+            if sensor is None:
+                header = LogHeader(record_format)
+            else:
+                config = sensor.get_config()
+                address = sensor.address if isinstance(sensor.address, int) else ADDRESS_SPI
+                header = LogHeader(record_format, address, config.get_tmrc(), config.cycle_counts)
+        self.header = header
+        self.stream = stream
+        self.records = 0    # количество записей
+        self._packed = FORMAT_INT24 == header.record_format
+        self._rec = bytearray(header.get_record_size())
+        self._block = bytearray(block_size)
+        self._mv_block = memoryview(self._block)
+        self._mv_rec = memoryview(self._rec)
+        self._pos = 0
+        stream.write(header.to_bytes())
+
+    def _append(self):
+        """Копирует запись self._rec в блок, записывая заполненный блок в поток"""
+        block = self._mv_block
+        rec = self._mv_rec
+        pos = self._pos
+        size = len(rec)
+        free = len(block) - pos
+        if size < free:
+            block[pos:pos + size] = rec
+            self._pos = pos + size
+            return
+        block[pos:] = rec[:free]
+        self.stream.write(self._block)
+        rest = size - free
+        block[:rest] = rec[free:]
+        self._pos = rest
+
+    def put(self, x: int, y: int, z: int, ticks: int):
+        """Добавляет измерение с меткой времени ticks (ticks_us())"""
+        rec = self._rec
+        struct.pack_into("<I", rec, 0, ticks)
+        if self._packed:
+            # int24 big endian, без создания кортежа на каждую запись
+            rec[4] = (x >> 16) & 0xFF
+            rec[5] = (x >> 8) & 0xFF
+            rec[6] = x & 0xFF
+            rec[7] = (y >> 16) & 0xFF
+            rec[8] = (y >> 8) & 0xFF
+            rec[9] = y & 0xFF
+            rec[10] = (z >> 16) & 0xFF
+            rec[11] = (z >> 8) & 0xFF
+            rec[12] = z & 0xFF
+        else:
+            struct.pack_into("<iii", rec, 4, x, y, z)
+        self._append()
+        self.records += 1
+
+    def put_block(self, samples, ticks, count: int = 0) -> int:
+        """Добавляет count измерений из массива samples (x0, y0, z0, x1, ...) с метками времени из массива ticks
+        (смотри RM3100.read_into, DrdyReader.read_into). 0 - весь массив. Возвращает количество измерений."""
+        if count <= 0:
+            count = len(samples) // 3
+        put = self.put
+        for i in range(count):
+            j = 3 * i
+            put(samples[j], samples[j + 1], samples[j + 2], ticks[i])
+        return count
+
+    def flush(self):
+        """Записывает в поток неполный блок. Вызывайте перед закрытием файла!
+        После вызова границы блоков в файле больше не совпадают со страницами flash памяти."""
+        if self._pos:
+            self.stream.write(self._mv_block[:self._pos])
+            self._pos = 0
+        if hasattr(self.stream, "flush"):
+            self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+
+def read_header(stream) -> LogHeader:
+    """Считывает заголовок из потока, открытого для чтения в двоичном режиме"""
+    return LogHeader.from_bytes(stream.read(HEADER_SIZE))
+
+
+def iter_records(stream, header: LogHeader):
+    """Генератор записей (ticks, x, y, z) из потока, следующих за заголовком header. Без NumPy (MicroPython).
+    Неполная последняя запись отбрасывается."""
+    rec = bytearray(header.get_record_size())
+    packed = FORMAT_INT24 == header.record_format
+    while len(rec) == stream.readinto(rec):
+        ticks = struct.unpack_from("<I", rec, 0)[0]
+        if packed:
+            yield ticks, int24.decode(rec, 4), int24.decode(rec, 7), int24.decode(rec, 10)
+        else:
+            yield (ticks,) + struct.unpack_from("<iii", rec, 4)
+
+
+def get_dtype(record_format: int):
+    """Возвращает numpy.dtype записи. Только для CPython с установленным NumPy!"""
+    if numpy is None:
+        raise ImportError("NumPy is required!")
+    if FORMAT_INT24 == record_format:
+        return numpy.dtype([("ticks", "<u4"), ("raw", "u1", (9,))])
+    return numpy.dtype([("ticks", "<u4"), ("x", "<i4"), ("y", "<i4"), ("z", "<i4")])
+
+
+def load(path: str) -> tuple:
+    """Отображает файл записи в память (numpy.memmap) без копирования данных.
+    Возвращает кортеж: заголовок (LogHeader), структурированный массив записей (поля смотри get_dtype).
+    Неполная последняя запись (например, после сбоя питания) отбрасывается. Только для CPython с NumPy!
+    Memory-maps a log file. Returns (LogHeader, structured array of records)."""
+    if numpy is None:
+        raise ImportError("NumPy is required!")
+    with open(path, "rb") as f:
+        header = LogHeader.from_bytes(f.read(HEADER_SIZE))
+        f.seek(0, 2)
+        count = (f.tell() - HEADER_SIZE) // header.get_record_size()
+    dtype = get_dtype(header.record_format)
+    if 0 == count:
+        return header, numpy.zeros(0, dtype=dtype)
+    return header, numpy.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def get_xyz(records):
+    """Возвращает значения X, Y, Z записей в виде массива формы (N, 3). Для формата FORMAT_INT32 - без
+    копирования (представление структурированного массива), для FORMAT_INT24 - с декодированием (копия)."""
+    if "raw" in records.dtype.names:
+        return int24.decode_block(numpy.ascontiguousarray(records["raw"]).tobytes())
+    # поля x, y, z расположены в записи подряд
+    return numpy.lib.stride_tricks.as_strided(records["x"], shape=(len(records), 3),
+                                              strides=(records.itemsize, 4), writeable=False)
+
+
+def get_time_us(records, ticks_period: int = 1 << 30):
+    """Возвращает время записей (мкс, int64) от первой записи с учетом переполнения счетчика ticks_us()
+    с периодом ticks_period (на большинстве портов MicroPython 2**30)."""
+    ticks = records["ticks"].astype(numpy.int64)
+    result = numpy.zeros(len(ticks), dtype=numpy.int64)
+    if len(ticks) > 1:
+        result[1:] = numpy.cumsum(numpy.diff(ticks) % ticks_period)
+    return result
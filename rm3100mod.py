@@ -1,13 +1,15 @@
 """MicroPython module for RM3100 Geomagnetic Sensor"""
+import array
 import struct
-import micropython
 
 # MicroPython
 # mail: goctaprog@gmail.com
 # MIT license
-from sensor_pack import bus_service, geosensmod
+from sensor_pack import bus_service, compat, geosensmod, int24, ringbuf, converter
+import rm3100regs as regs
 from sensor_pack.base_sensor import check_value, Iterator
-import time
+# функции времени вызываются через модуль compat (compat.ticks_us()), чтобы действовала compat.set_clock
+from sensor_pack.compat import micropython, Pin
 
 
 @micropython.native
@@ -47,12 +49,12 @@ def _axis_name_to_reg_addr(axis_name: str, offset: int, multiplier: int) -> int:
 
 def _axis_name_to_ccr_addr(axis_name: str) -> int:
     """Преобразует имя оси ('x', 'y', 'z', 'X', 'Y', 'Z') в адрес соответствующего регистра CCR(Cycle Count Register)"""
-    return _axis_name_to_reg_addr(axis_name, 4, 2)
+    return _axis_name_to_reg_addr(axis_name, regs.CCR_X.address, 2)
 
 
 def _axis_name_to_mxyz_addr(axis_name: str) -> int:
     """Преобразует имя оси ('x', 'y', 'z', 'X', 'Y', 'Z') в адрес соответствующего регистра CCR(Cycle Count Register)"""
-    return _axis_name_to_reg_addr(axis_name, 0x24, 3)
+    return _axis_name_to_reg_addr(axis_name, regs.MX.address, 3)
 
 
 def get_conversion_cycle_time(update_rate: int) -> int:
@@ -64,14 +66,44 @@ def get_conversion_cycle_time(update_rate: int) -> int:
     return 1667 * (2 ** update_rate)
 
 
-def _from_bytes(source: bytes, big_byte_order: bool = True, signed=False) -> int:
-    order = tuple(reversed(source)) if big_byte_order else tuple(source)
-    #
-    n = sum(byte << 8 * index for index, byte in enumerate(order))
-    if signed and order and (order[-1] & 0x80):
-        n -= 1 << 8 * len(order)
+def get_axis_conversion_time(cycle_count: int) -> int:
+    """Возвращает время измерения по одной оси в микросекундах при количестве циклов cycle_count.
+    Аппроксимация Table 3-1 документации (максимальная частота измерений по одной оси):
+    50 циклов - 1600 Hz, 100 - 850 Hz, 200 - 440 Hz. При измерении по нескольким осям время складывается."""
+    return 75 + 11 * cycle_count
 
-    return n
+
+def get_bus_read_time(bytes_count: int, bus_freq: int, spi: bool = False) -> int:
+    """Возвращает оценку длительности (мкс) чтения bytes_count байт из регистров датчика.
+    I2C: адрес устройства, адрес регистра, повторный START, адрес устройства, данные; 9 бит на байт.
+    SPI: адрес регистра и данные; 8 бит на байт."""
+    bits = 8 * (1 + bytes_count) if spi else 9 * (3 + bytes_count) + 3
+    return 1 + 1_000_000 * bits // bus_freq
+
+
+# Table 3-1: количество циклов - чувствительность (LSB/мкТл)
+_GAIN_TABLE = ((50, 20), (100, 38), (200, 75))
+
+
+def get_gain(cycle_count: int) -> float:
+    """Возвращает чувствительность (LSB/мкТл) при количестве циклов cycle_count. Линейная интерполяция
+    Table 3-1 документации (50 - 20, 100 - 38, 200 - 75 LSB/мкТл), за ее пределами - экстраполяция
+    по ближайшему отрезку."""
+    check_value(cycle_count, range(1, 0x10000), f"Invalid cycle count value: {cycle_count}")
+    table = _GAIN_TABLE
+    i = 0
+    while i < len(table) - 2 and cycle_count > table[i + 1][0]:
+        i += 1
+    (c0, g0), (c1, g1) = table[i], table[i + 1]
+    return g0 + (g1 - g0) * (cycle_count - c0) / (c1 - c0)
+
+
+# регистры конфигурации, копия которых хранится в драйвере (теневые регистры): {адрес: маска сравнения}.
+# CMM, CCR X/Y/Z (по два байта), TMRC, HSHAKE (биты NACK 4..6 устанавливает сам датчик, они не сравниваются)
+_SHADOW_MASKS = {addr: 0xFF for addr in range(regs.CCR_X.address, regs.CCR_Z.address + 2)}
+_SHADOW_MASKS[regs.CMM.address] = 0xFF
+_SHADOW_MASKS[regs.TMRC.address] = 0xFF
+_SHADOW_MASKS[regs.HSHAKE.address] = 0x8F
 
 
 def _to_str(source: bytes) -> str:
@@ -81,16 +113,111 @@ def _to_str(source: bytes) -> str:
     return res
 
 
+class MeasConfig:
+    """Профиль настроек измерений RM3100. Применяется методом RM3100.apply_config за минимальное количество
+    транзакций по шине, считывается с датчика методом RM3100.get_config за одну транзакцию.
+    Например, переключение между профилями "быстро" и "точно" во время работы:
+        fast = MeasConfig(cycle_counts=(50, 50, 50), update_rate=1)
+        precise = MeasConfig(cycle_counts=(400, 400, 400), update_rate=4)
+        sensor.apply_config(fast)
+
+    RM3100 measurement settings profile."""
+
+    def __init__(self, cycle_counts: tuple = (200, 200, 200), update_rate: int = 6, axis: [set, str] = "XYZ",
+                 full_meas_seq: bool = True, single_mode: bool = False):
+        """cycle_counts - количество циклов измерения по осям X, Y, Z (30..400, смотри set_axis_cycle_count);
+        update_rate, axis, full_meas_seq, single_mode - смотри RM3100.start_measure."""
+        for cc in cycle_counts:
+            check_value(cc, range(30, 401), f"Invalid cycle count value: {cc}")
+        check_value(update_rate, range(14), f"Invalid update rate: {update_rate}")
+        self.cycle_counts = tuple(cycle_counts)
+        self.update_rate = update_rate
+        self.axis = axis
+        self.full_meas_seq = full_meas_seq
+        self.single_mode = single_mode
+
+    def get_cmm(self) -> int:
+        """Возвращает значение регистра CMM для профиля"""
+        if self.single_mode:
+            return 0
+        data_ready_mode = 0 if self.full_meas_seq else 1
+        return regs.CMM.make(start=1, drdm=data_ready_mode, axes=_axis_to_int(self.axis))
+
+    def get_ccr(self) -> bytes:
+        """Возвращает значения регистров CCR X, Y, Z (6 байт, big endian) для профиля"""
+        return b"".join(cc.to_bytes(2, "big") for cc in self.cycle_counts)
+
+    def get_tmrc(self) -> int:
+        """Возвращает значение регистра TMRC для профиля"""
+        return regs.TMRC.make(rate=regs.TMRC_RATE_OFFSET + self.update_rate)
+
+
+def plan_config(rate_hz: float, axis: [set, str] = "XYZ", bus_freq: int = 400_000, spi: bool = False,
+                single_mode: bool = False, polling: bool = True) -> tuple:
+    """Подбирает настройки для получения измерений с частотой не ниже rate_hz (Гц) с наилучшим разрешением.
+    Выбирает наибольшее количество циклов (30..400), при котором время измерения по осям axis и время чтения
+    результатов по шине (bus_freq Гц, I2C или SPI) укладываются в период rate_hz. В режиме периодических
+    измерений преобразование и чтение по шине идут одновременно, в режиме однократных - последовательно.
+    update_rate выбирается наименьшим (частота TMRC), но не ниже rate_hz.
+    polling - если Истина, учитывается опрос STATUS перед каждым чтением (без вывода DRDY).
+    Возвращает кортеж: MeasConfig, фактически достижимая частота измерений (Гц). Если rate_hz недостижима,
+    то возвращаются самые быстрые настройки, а достижимая частота будет меньше rate_hz!"""
+    if rate_hz <= 0:
+        raise ValueError(f"Invalid rate value: {rate_hz}")
+    axes = _axis_to_int(axis)
+    n_axes = (axes & 1) + ((axes >> 1) & 1) + ((axes >> 2) & 1)
+    if not n_axes:
+        raise ValueError(f"Invalid axis value: {axis}")
+    period = 1_000_000 / rate_hz
+    bus_time = get_bus_read_time(9, bus_freq, spi)
+    if polling:
+        bus_time += get_bus_read_time(1, bus_freq, spi)
+    # время на преобразование по всем осям
+    budget = period - bus_time if single_mode else period
+    cycle_count = 400
+    while cycle_count > 30 and n_axes * get_axis_conversion_time(cycle_count) > budget:
+        cycle_count -= 1
+    # наименьшая частота TMRC, не меньшая rate_hz
+    update_rate = 0
+    while update_rate < 13 and get_conversion_cycle_time(update_rate + 1) <= period:
+        update_rate += 1
+    conv_time = n_axes * get_axis_conversion_time(cycle_count)
+    if single_mode:
+        sample_time = conv_time + bus_time
+    else:
+        sample_time = max(conv_time, bus_time, get_conversion_cycle_time(update_rate))
+    config = MeasConfig(cycle_counts=(cycle_count, cycle_count, cycle_count), update_rate=update_rate,
+                        axis=axis, single_mode=single_mode)
+    return config, 1_000_000 / sample_time
+
+
 class RM3100(geosensmod.GeoMagneticSensor, Iterator):
     """RM3100 Geomagnetic Sensor."""
 
-    def __init__(self, adapter: bus_service.BusAdapter, address: int = 0x20):
-        self._buf_2 = bytearray((0 for _ in range(2)))  # для хранения
+    def __init__(self, adapter: bus_service.BusAdapter, address: [int, Pin] = 0x20):
+        """adapter - I2cAdapter или SpiAdapter.
+        address - адрес на шине I2C (0x20..0x23) или вывод MCU, подключенный к выводу CS датчика (для SPI)."""
+        self._buf_1 = bytearray(1)  # для чтения STATUS без размещения в куче
         self._buf_3 = bytearray((0 for _ in range(3)))  # для хранения
         self._buf_9 = bytearray((0 for _ in range(9)))  # для хранения
         self._update_rate = 6   # 9 Hz
-        # адрес в диапазоне 0x20..0x23!
-        check_value(address, range(0x20, 0x24), f"Invalid address value: {address}")
+        # теневые регистры конфигурации {адрес: значение}. Заполняются при записи и при чтении с датчика.
+        self._shadow = dict()
+        # если Истина, то каждое обращение к теневому регистру проверяется чтением регистра датчика
+        self.strict = False
+        # время измерения (мкс) для каждого из 8 сочетаний осей (индекс - битовая маска осей: 1 - X, 2 - Y, 4 - Z).
+        # Вычисляется по значениям CCR при первом обращении, сбрасывается при их изменении. Смотри get_meas_time.
+        self._meas_times = None
+        # множители перевода отсчетов в единицы измерения по осям, смотри get_scales
+        self._scales = None
+        self._scales_key = None
+        self._meas_axes = 0x07          # оси последнего запуска измерения
+        self._meas_deadline = 0         # значение compat.ticks_us() расчетного окончания однократного измерения
+        # учет пропущенных измерений при итерации (OverrunMonitor) или None
+        self.monitor = None
+        # адрес на шине I2C в диапазоне 0x20..0x23!
+        if isinstance(address, int):
+            check_value(address, range(0x20, 0x24), f"Invalid address value: {address}")
         super().__init__(adapter=adapter, address=address, big_byte_order=True)     # big endian
         self.setup()
 
@@ -107,6 +234,134 @@ class RM3100(geosensmod.GeoMagneticSensor, Iterator):
         """Записывает в регистр с адресом reg_addr значение value по шине."""
         bo = self._get_byteorder_as_str()[0]
         self.adapter.write_register(self.address, reg_addr, value, bytes_count, bo)
+        self._put_shadow(reg_addr, value, bytes_count)
+
+    def _put_shadow(self, reg_addr: int, value: [int, bytes, bytearray], bytes_count: int = 1):
+        """Обновляет теневые регистры после записи value в регистр(ы) датчика, начиная с reg_addr"""
+        if isinstance(value, int):
+            value = value.to_bytes(bytes_count, self._get_byteorder_as_str()[0])
+        shadow = self._shadow
+        for offset, byte in enumerate(value):
+            if reg_addr + offset in _SHADOW_MASKS:
+                shadow[reg_addr + offset] = byte
+        if reg_addr < regs.CCR_Z.address + 2 and reg_addr + len(value) > regs.CCR_X.address:
+            self._reset_ccr_cache()
+
+    def _get_shadow(self, reg_addr: int, bytes_count: int = 1) -> int:
+        """Возвращает значение регистра(ов) конфигурации из теневой копии без обращения к шине.
+        Если копии нет, считывает регистр(ы) с датчика и запоминает.
+        В строгом режиме (strict) сверяет копию с датчиком и возбуждает ValueError при расхождении."""
+        shadow = self._shadow
+        value = 0
+        for addr in range(reg_addr, reg_addr + bytes_count):
+            if addr not in shadow:
+                break
+            value = (value << 8) | shadow[addr]
+        else:
+            if self.strict:
+                self._verify_shadow(reg_addr, bytes_count)
+            return value
+        # промах
+        value = 0
+        for offset, byte in enumerate(self._read_reg(reg_addr, bytes_count)):
+            shadow[reg_addr + offset] = byte
+            value = (value << 8) | byte
+        return value
+
+    def _verify_shadow(self, reg_addr: int, bytes_count: int):
+        """Сверяет теневые регистры с регистрами датчика"""
+        for offset, byte in enumerate(self._read_reg(reg_addr, bytes_count)):
+            addr = reg_addr + offset
+            if (byte ^ self._shadow[addr]) & _SHADOW_MASKS[addr]:
+                raise ValueError(f"Shadow register 0x{addr:x} mismatch: 0x{self._shadow[addr]:x} != 0x{byte:x}")
+
+    def _update_reg(self, reg: regs.Register, force: bool = False, **values) -> int:
+        """Изменяет поля (имя=значение) регистра конфигурации reg одной записью (чтение-изменение-запись).
+        Исходное значение берется из теневой копии, поэтому чтения по шине обычно нет. Если новое значение
+        совпадает со старым, то запись выполняется, только если force Истина (запись CMM перезапускает измерения).
+        Возвращает новое значение регистра."""
+        old = self._get_shadow(reg.address)
+        new = reg.put(old, **values)
+        if force or new != old:
+            self._write_reg(reg.address, new)
+        return new
+
+    def refresh(self):
+        """Заполняет теневые регистры значениями, считанными с датчика.
+        Нужно вызывать, если конфигурацию датчика изменил кто-то другой (сброс питания, другой драйвер)."""
+        shadow = self._shadow
+        shadow.clear()
+        ccr_addr = regs.CCR_X.address
+        for offset, byte in enumerate(self._read_reg(ccr_addr, 6)):    # CCR X, Y, Z одним чтением
+            shadow[ccr_addr + offset] = byte
+        for reg in (regs.CMM, regs.TMRC, regs.HSHAKE):
+            shadow[reg.address] = self._read_reg(reg.address)[0]
+        self._update_rate = regs.TMRC.get(shadow[regs.TMRC.address], "rate") - regs.TMRC_RATE_OFFSET
+        self._reset_ccr_cache()
+
+    def invalidate(self):
+        """Сбрасывает теневые регистры. Следующее обращение к каждому из них выполнит чтение с датчика."""
+        self._shadow.clear()
+        self._reset_ccr_cache()
+
+    def _reset_ccr_cache(self):
+        """Сбрасывает величины, вычисленные по значениям CCR"""
+        self._meas_times = None
+        self._scales = None
+
+    def get_meas_time(self, axes: int = -1) -> int:
+        """Возвращает время измерения (мкс) по осям из битовой маски axes (1 - X, 2 - Y, 4 - Z) с учетом
+        количества циклов каждой оси (get_axis_conversion_time). Если axes равен -1, то берутся оси последнего
+        вызова start_measure. Значения для всех сочетаний осей вычисляются заранее, поэтому вызов не обращается
+        к шине и ничего не вычисляет."""
+        times = self._meas_times
+        if times is None:
+            t = [get_axis_conversion_time(self.get_axis_cycle_count(name)) for name in "xyz"]
+            times = array.array("I", (sum(t[i] for i in range(3) if mask & (1 << i)) for mask in range(8)))
+            self._meas_times = times
+        return times[self._meas_axes if axes < 0 else axes]
+
+    def get_scales(self, units_per_ut: int = 1000, shift: int = 10):
+        """Возвращает массив множителей (array('i'), по осям X, Y, Z) с фиксированной точкой (shift дробных бит)
+        для перевода отсчетов в единицы измерения функциями converter.scale_fixed/scale_fixed_into.
+        units_per_ut - количество единиц в мкТл: 1000 - нТл, 1 - мкТл, 10 - десятые доли мкТл.
+        Чувствительность по каждой оси берется из get_gain по количеству циклов (CCR) этой оси.
+        При shift = 10 и единицах нТл произведение отсчета на множитель не выходит за пределы short int MicroPython
+        во всем диапазоне датчика (±800 мкТл), поэтому перевод не размещает объектов в куче.
+        Массив вычисляется один раз и пересчитывается только при изменении CCR."""
+        key = units_per_ut, shift
+        if self._scales is None or self._scales_key != key:
+            self._scales = array.array("i", (converter.get_fixed_scale(
+                units_per_ut / get_gain(self.get_axis_cycle_count(name)), shift) for name in "xyz"))
+            self._scales_key = key
+        return self._scales
+
+    def convert_into(self, samples, out, count: int = 0, units_per_ut: int = 1000, shift: int = 10) -> int:
+        """Переводит count измерений массива samples (x0, y0, z0, x1, ... в отсчетах, например, из read_into)
+        в нТл (units_per_ut = 1000) или другие единицы (смотри get_scales) и записывает в out (может быть
+        тем же массивом). Только целочисленная арифметика. Возвращает количество обработанных измерений."""
+        return converter.scale_fixed_into(samples, out, self.get_scales(units_per_ut, shift), shift, count)
+
+    def wait_meas(self, timeout_us: int = 0, poll_func=None) -> bool:
+        """Ожидает окончания однократного измерения, запущенного start_measure: спит до момента, немного
+        предшествующего расчетному окончанию (get_meas_time), затем опрашивает STATUS.
+        timeout_us - наибольшее время опроса STATUS (0 - время одного измерения).
+        poll_func() вызывается между опросами STATUS (если не None).
+        Возвращает Истина, если результат готов."""
+        meas_time = self.get_meas_time()
+        guard = 20 + (meas_time >> 4)   # запас на погрешность модели времени измерения
+        remaining = compat.ticks_diff(self._meas_deadline, compat.ticks_us()) - guard
+        if remaining > 0:
+            compat.sleep_us(remaining)
+        if timeout_us <= 0:
+            timeout_us = meas_time
+        start = compat.ticks_us()
+        while not self._is_drdy():
+            if compat.ticks_diff(compat.ticks_us(), start) > timeout_us:
+                return False
+            if poll_func is not None:
+                poll_func()
+        return True
 
     def _set_update_rate(self, update_rate: int):
         """для режима периодических измерений, устанавливает частоту обновления значений величины магнитного поля
@@ -114,62 +369,129 @@ class RM3100(geosensmod.GeoMagneticSensor, Iterator):
         0 - 600 Hz; 1 - 300 Hz; 2 - 150 Hz; 3 - 75 Hz; 4 - 37 Hz; 5 - 18 Hz; ...; 13 - ~0.075 Hz"""
         check_value(update_rate, range(14), f"Invalid update rate: {update_rate}")
         # Setting the CMM Update Rate with TMRC (0x0B)
-        self._write_reg(0x0B, 0x92 + update_rate)
+        self._write_reg(regs.TMRC.address, regs.TMRC.make(rate=regs.TMRC_RATE_OFFSET + update_rate))
         self._update_rate = update_rate
 
     def _get_update_rate(self) -> int:
-        self._update_rate = self._read_reg(0x0B)[0] - 0x92
+        self._update_rate = regs.TMRC.get(self._get_shadow(regs.TMRC.address), "rate") - regs.TMRC_RATE_OFFSET
         return self._update_rate
 
     def _get_cmm(self) -> int:
-        """Возвращает значение регистра CMM"""
-        return self._read_reg(0x01)[0]
+        """Возвращает значение регистра CMM (из теневой копии)"""
+        return self._get_shadow(regs.CMM.address)
 
     def get_id(self):
         """Возвращает значение (REVID), которое не определено в документации, что странно!
         return MagI2C Revision Identification"""
-        return self._read_reg(0x36)[0]
+        return self._read_reg(regs.REVID.address)[0]
 
     def is_continuous_meas_mode(self):
         """Возвращает Истина, когда включен режим периодических измерений!"""
-        return 0 != (0x01 & self._get_cmm())
+        return 0 != regs.CMM.get(self._get_cmm(), "start")
 
     def is_single_meas_mode(self):
         """Возвращает Истина, когда включен режим однократных измерений (по запросу)!
         Для переопределения программистом!!!"""
-        return 0 == (0x01 & self._get_cmm())
+        return 0 == regs.CMM.get(self._get_cmm(), "start")
 
     def get_status(self) -> tuple:
         """Возвращает кортеж битов(номер бита): DRDY(7), """
-        stat = self._read_reg(0x34)[0]
-        return 0 != (stat & 0x80),
+        stat = self._read_reg(regs.STATUS.address)[0]
+        return 0 != (stat & regs.DRDY_MASK),
 
     def is_data_ready(self) -> bool:
         return self.get_status()[0]
 
+    def _is_drdy(self) -> bool:
+        """То же, что is_data_ready, но без размещения объектов в куче"""
+        buf = self._buf_1
+        self.adapter.read_buf_from_mem(self.address, regs.STATUS.address, buf)
+        return 0 != buf[0] & regs.DRDY_MASK
+
     def perform_self_test(self) -> tuple:
         """Возвращает кортеж результатов самопроверки!"""
-        bist_addr = 0x33
-        poll_addr = 0x00
-        cmm_addr = 0x00
-        hshake_addr = 0x35
+        bist_reg = regs.BIST
+        hshake = self._get_shadow(regs.HSHAKE.address)
         try:
-            self._write_reg(reg_addr=cmm_addr, value=0x70)
-            self._write_reg(reg_addr=hshake_addr, value=0x08)
-
-            self._write_reg(bist_addr, 0x8F)      # start the built-in self test
-            self._write_reg(poll_addr, 0x70)  # запускаю измерение по всем трем осям
+            self._update_reg(regs.CMM, start=0)     # самопроверка только в режиме однократных измерений
+            # DRC0: запись в POLL сбрасывает DRDY, оставшийся от предыдущего измерения
+            self._update_reg(regs.HSHAKE, drc0=1)
+            # start the built-in self test
+            self._write_reg(bist_reg.address, bist_reg.make(ste=1, bw=3, bp=3))
+            self._write_reg(regs.POLL.address, regs.POLL.make(axes=0x07))  # запускаю измерение по всем трем осям
             counter = 0
             while True:
-                time.sleep_ms(10)
+                compat.sleep_ms(10)
                 if counter > 3 or self.get_status()[0]:
                     break   # The end of the built-in self test sequence
                 counter += 1
-            bist = self._read_reg(bist_addr)[0]
+            bist = self._read_reg(bist_reg.address)[0]
+            axes = bist_reg.get(bist, "axes")
             #       Z axis OK,   Y axis OK,   X axis OK,    Timeout Period,     LR Periods
-            return 0 != bist & 0x40, 0 != bist & 0x20, 0 != bist & 0x10, (bist & 0b1100) >> 2, bist & 0b11
+            return (0 != axes & 0x04, 0 != axes & 0x02, 0 != axes & 0x01,
+                    bist_reg.get(bist, "bw"), bist_reg.get(bist, "bp"))
         finally:
-            self._write_reg(reg_addr=bist_addr, value=0x00)  # disable self-test mode, clear STE bit
+            self._write_reg(bist_reg.address, 0x00)  # disable self-test mode, clear STE bit
+            self._update_reg(regs.HSHAKE, drc0=regs.HSHAKE.get(hshake, "drc0"))
+
+    def apply_config(self, config: MeasConfig) -> int:
+        """Применяет профиль настроек config. Записываются только регистры, значения которых отличаются от
+        теневой копии: CCR X/Y/Z - одной непрерывной записью, затем TMRC, затем CMM (запись CMM запускает
+        периодические измерения, поэтому она последняя). Регистры 0x02, 0x03, 0x0A не документированы,
+        поэтому CMM, CCR и TMRC нельзя объединить в одну запись.
+        В режиме однократных измерений профиль только настраивает датчик, измерение запускает start_measure.
+        Возвращает количество выполненных транзакций записи (не более трех)."""
+        shadow = self._shadow
+        transactions = 0
+        ccr = config.get_ccr()
+        ccr_addr = regs.CCR_X.address
+        changed = [i for i in range(len(ccr)) if shadow.get(ccr_addr + i) != ccr[i]]
+        if changed:
+            first, last = changed[0], 1 + changed[-1]
+            self._write_reg(ccr_addr + first, ccr[first:last], last - first)
+            transactions += 1
+        if not config.single_mode:
+            tmrc = config.get_tmrc()
+            if shadow.get(regs.TMRC.address) != tmrc:
+                self._write_reg(regs.TMRC.address, tmrc)
+                transactions += 1
+            self._update_rate = config.update_rate
+        self._meas_axes = _axis_to_int(config.axis)     # для get_meas_time, как после start_measure
+        cmm = config.get_cmm()
+        if not config.single_mode or shadow.get(regs.CMM.address) != cmm:
+            self._write_reg(regs.CMM.address, cmm)
+            transactions += 1
+        return transactions
+
+    def tune(self, rate_hz: float, axis: [set, str] = "XYZ", bus_freq: int = 400_000,
+             single_mode: bool = False, polling: bool = True) -> float:
+        """Подбирает (plan_config) и применяет (apply_config) настройки с наилучшим разрешением для частоты
+        измерений не ниже rate_hz. bus_freq - частота шины (I2C или SPI, тип определяется по адаптеру).
+        Возвращает фактически достижимую частоту измерений (Гц)."""
+        # обертка (например, bus_service.InstrumentedAdapter) хранит исходный адаптер в атрибуте adapter
+        adapter = getattr(self.adapter, "adapter", self.adapter)
+        spi = isinstance(adapter, bus_service.SpiAdapter)
+        config, rate = plan_config(rate_hz, axis, bus_freq, spi, single_mode, polling)
+        self.apply_config(config)
+        return rate
+
+    def get_config(self) -> MeasConfig:
+        """Считывает регистры CMM..TMRC (0x01..0x0B) одной транзакцией, обновляет теневую копию и
+        возвращает текущий профиль настроек датчика. Его можно позже восстановить методом apply_config."""
+        first = regs.CMM.address
+        buf = bytearray(1 + regs.TMRC.address - first)
+        self.read_buf_from_mem(first, buf)
+        self._put_shadow(first, buf)
+        cmm_reg = regs.CMM
+        cmm = buf[0]
+        ccr_offset = regs.CCR_X.address - first
+        ccr = tuple((buf[i] << 8) | buf[i + 1] for i in range(ccr_offset, ccr_offset + 6, 2))
+        axes = cmm_reg.get(cmm, "axes")
+        axis = "".join(name for index, name in enumerate("XYZ") if axes & (1 << index))
+        update_rate = regs.TMRC.get(buf[-1], "rate") - regs.TMRC_RATE_OFFSET
+        self._update_rate = update_rate
+        return MeasConfig(cycle_counts=ccr, update_rate=update_rate, axis=axis,
+                          full_meas_seq=0 == cmm_reg.get(cmm, "drdm"), single_mode=0 == cmm_reg.get(cmm, "start"))
 
     def soft_reset(self):
         """Выполняет програмный сброс датчика"""
@@ -186,17 +508,19 @@ class RM3100(geosensmod.GeoMagneticSensor, Iterator):
         как установлено осями в axis!,
         иначе вывод DRDY установится в 1 после завершения измерения по любой ОДНОЙ оси!!;"""
         _axis = _axis_to_int(axis=axis)
-        _axis <<= 4  # в CMM и POLL оси занимают с 4 бита по 6!
+        self._meas_axes = _axis
         data_ready_mode = 0
         if not full_meas_seq:
             data_ready_mode = 1
 
         if not single_mode:     # Continuous Measurement Mode!
             self._set_update_rate(update_rate)
-            self._write_reg(reg_addr=0x01, value=_axis | (data_ready_mode << 2) | 0x01)
+            # все поля CMM одной записью, запись перезапускает периодические измерения
+            self._update_reg(regs.CMM, True, start=1, drdm=data_ready_mode, axes=_axis)
         else:                   # single mode
-            self._write_reg(reg_addr=0x01, value=0)     # Continuous Measurement Mode disabled
-            self._write_reg(reg_addr=0x00, value=_axis)  # запускаю однократное измерение
+            self._update_reg(regs.CMM, start=0)     # Continuous Measurement Mode disabled (если был включен)
+            self._write_reg(regs.POLL.address, regs.POLL.make(axes=_axis))  # запускаю однократное измерение
+            self._meas_deadline = compat.ticks_add(compat.ticks_us(), self.get_meas_time())
 
     def set_axis_cycle_count(self, axis_name: str, value: int):
         """Устанавливает количество циклов для измерения магнитного поля по оси axis_name!
@@ -210,31 +534,59 @@ class RM3100(geosensmod.GeoMagneticSensor, Iterator):
         addr = _axis_name_to_ccr_addr(axis_name)
         bo_t = self._get_byteorder_as_str()
         bts = struct.pack(bo_t[1]+"H", value)
-        self.adapter.write_register(self.address, addr, bts, 0, '')
+        self._write_reg(addr, bts, len(bts))
 
     def get_axis_cycle_count(self, axis_name: str) -> int:
         """Возвращает количество циклов для измерения магнитного поля по оси axis_name!"""
         addr = _axis_name_to_ccr_addr(axis_name)
-        #bts = self._read_reg(addr, 2)
-        bts = self._buf_2
-        self.read_buf_from_mem(addr, bts)
-        return self.unpack(fmt_char="H", source=bts)[0]
+        return self._get_shadow(addr, 2)
 
     def read_raw(self, axis_name: int) -> int:
         addr = _axis_name_to_mxyz_addr(_int_to_axis_name(axis_name))
         #bts = self._read_reg(reg_addr=addr, bytes_count=3)  # 24 bit value (int24)
         bts = self._buf_3
         self.read_buf_from_mem(addr, bts)
-        return _from_bytes(source=bts, big_byte_order=True, signed=True)
+        return int24.decode(bts, 0)
 
     def _get_all_meas_result(self) -> tuple:
         """Для наибыстрейшего считывания за один вызов всех результатов измерений из датчика по
         относительно медленной шине! Для переопределения программистом!!!"""
         #bts = self._read_reg(reg_addr=0x24, bytes_count=9)  # 24 bit value (int24)
         bts = self._buf_9
-        self.read_buf_from_mem(0x24, bts)
-        t = (_from_bytes(source=bts[3 * index:3 * (index+1)], big_byte_order=True, signed=True) for index in range(3))
-        return tuple(t)
+        self.read_buf_from_mem(regs.MX.address, bts)
+        decode = int24.decode
+        return decode(bts, 0), decode(bts, 3), decode(bts, 6)
+
+    def read_into(self, samples, count: int = 0, wait_func=None, ticks=None) -> int:
+        """Заполняет массив samples (array('i')) результатами count измерений по трем осям: x0, y0, z0, x1, y1, z1, ...
+        Если count равен 0, то массив заполняется целиком (len(samples) // 3 измерений).
+        Если ticks не None (array('I')), то в ticks[i] записывается значение ticks_us() в момент обнаружения
+        готовности i-го измерения.
+        Перед считыванием каждого измерения ожидает установки бита DRDY, вызывая wait_func() (если не None)
+        между опросами STATUS. Предназначен для режима периодических измерений!
+        Использует только внутренние буферы, поэтому не размещает объектов в куче на каждое измерение.
+        Возвращает количество считанных измерений.
+
+        Fills samples (array('i')) with count three-axis measurements: x0, y0, z0, x1, y1, z1, ...
+        Zero heap allocations per measurement. For continuous measurement mode!"""
+        if count <= 0:
+            count = len(samples) // 3
+        if 3 * count > len(samples) or (ticks is not None and count > len(ticks)):
+            raise ValueError(f"Array too small for {count} samples: {len(samples)}")
+        buf = self._buf_9
+        read_buf = self.adapter.read_buf_from_mem
+        addr = self.address
+        is_drdy = self._is_drdy
+        decode_into = int24.decode_into
+        for index in range(count):
+            while not is_drdy():
+                if wait_func is not None:
+                    wait_func()
+            if ticks is not None:
+                ticks[index] = compat.ticks_us()
+            read_buf(addr, regs.MX.address, buf)
+            decode_into(buf, samples, 3, 3 * index)
+        return count
 
     def setup(self):
         """Настройка режима работы датчика.
@@ -244,14 +596,364 @@ class RM3100(geosensmod.GeoMagneticSensor, Iterator):
                             иначе измерения запускаются автоматически с частотой data_rate
         """
         # DRC0 = 0, DRC1 = 1
-        self._write_reg(reg_addr=0x35, value=0x0A)
+        self._write_reg(regs.HSHAKE.address, regs.HSHAKE.make(drc0=0, drc1=1))
         pass
 
+    def stream(self, axis: [set, str] = "XYZ", update_rate: int = 6, single_mode: bool = False,
+               drdy=None, count: int = 0):
+        """Возвращает асинхронный итератор результатов измерений: async for x, y, z in sensor.stream(...).
+        Параметры смотри в rm3100stream.MeasStream. Модуль asyncio импортируется только при вызове."""
+        import rm3100stream
+        return rm3100stream.MeasStream(self, axis, update_rate, single_mode, drdy, count)
+
     def __iter__(self):
         return self
 
     def __next__(self):
-        """возвращает результат только в режиме периодических измерений!"""
-        if self.is_continuous_meas_mode and self.is_data_ready():
+        """возвращает результат только в режиме периодических измерений!
+        Если задан self.monitor (OverrunMonitor), то время получения каждого результата передается ему."""
+        if self.is_continuous_meas_mode() and self._is_drdy():
+            if self.monitor is not None:
+                self.monitor.put(compat.ticks_us())
             return self.get_axis(-1)
         return None
+
+
+class OverrunMonitor:
+    """Учет пропущенных (перезаписанных датчиком до считывания) измерений в режиме периодических измерений.
+    Расчетный период измерений датчика: период TMRC, но не меньше времени измерения по всем осям. По интервалу между
+    метками времени соседних полученных измерений вычисляется, сколько измерений было пропущено между ними.
+    Метки времени передаются методами put/put_block: из RM3100.__next__ (если sensor.monitor = monitor),
+    из массива ticks методов RM3100.read_into и DrdyReader.read_into.
+    Обратное давление: если доля пропущенных измерений в окне из window ожидаемых превышает max_drop_ratio,
+    частота обновления датчика уменьшается вдвое (update_rate + 1, не более 13).
+
+    Частота генератора датчика известна лишь приблизительно (отличие от модели - единицы процентов), поэтому
+    интервалы переводятся в количество периодов по наблюдаемому периоду observed_period (начальная оценка -
+    расчетный период, пределы - ±1/4 расчетного периода period). Метка времени - момент обнаружения, а не окончания
+    измерения, поэтому время отсчитывается от измерения с малой задержкой обнаружения (начало отсчета), а количество
+    периодов округляется вниз. Начало отсчета переносится к измерению с наименьшей задержкой за последние REBASE
+    периодов или к измерению, обнаруженному раньше расчетного момента; наблюдаемый период уточняется по времени
+    между такими измерениями, поэтому паузы в опросе не искажают ни подсчет, ни период. Если опрос готовности
+    почти так же редок, как измерения, то подсчет пропусков приблизителен.
+
+    Counts samples overwritten by the sensor before they were read in continuous mode, from the sample
+    timestamps and the observed sample period (seeded with the TMRC period, refined between low-lag samples).
+    Optionally steps the update rate down when the drop ratio is too high."""
+    # запас (1 / 2**GUARD_SHIFT периода) при переводе времени в количество периодов: разброс задержки обнаружения
+    GUARD_SHIFT = 6
+    # задержка обнаружения не меньше (1 - 1 / 2**LAG_SHIFT) периода - признак неучтенного пропуска
+    LAG_SHIFT = 3
+    # наибольшее количество периодов от начала отсчета до его переноса. Это же вес (в периодах) прежней оценки
+    # наблюдаемого периода при ее уточнении
+    REBASE = 16
+    # наименьшее количество периодов, по которому уточняется наблюдаемый период
+    FIT_PERIODS = 8
+
+    def __init__(self, sensor: RM3100, max_drop_ratio: float = 0, window: int = 64):
+        """max_drop_ratio - допустимая доля пропущенных измерений (0 - без обратного давления).
+        window - количество ожидаемых измерений в окне оценки доли пропусков."""
+        if window < 1:
+            raise ValueError(f"Invalid window: {window}")
+        self.sensor = sensor
+        self.max_drop_ratio = max_drop_ratio
+        self.window = window
+        self.period = 0             # расчетный период (мкс) по настройкам датчика
+        self.observed_period = 0    # наблюдаемый период (мкс)
+        self.update_period()
+        self.reset()
+
+    def reset(self):
+        """Обнуляет счетчики"""
+        self.delivered = 0      # количество полученных измерений
+        self.dropped = 0        # количество пропущенных измерений
+        self.overruns = 0       # количество случаев пропуска (одного или нескольких измерений подряд)
+        self.rate_changes = 0   # количество снижений частоты обновления
+        self.elapsed_us = 0     # суммарная длительность учтенных интервалов между измерениями
+        self._intervals = 0
+        self._last = None
+        self._win_expected = 0
+        self._win_dropped = 0
+
+    def _restart_fit(self):
+        """Начинает уточнение наблюдаемого периода заново от начала отсчета"""
+        self._prior = self.observed_period
+        self._fit_span = 0      # время между началом уточнения и началом отсчета (мкс)
+        self._fit_periods = 0   # количество периодов между началом уточнения и началом отсчета
+
+    def update_period(self):
+        """Вычисляет период измерений по текущим настройкам датчика (без обращения к шине).
+        Вызывайте после изменения настроек датчика!"""
+        sensor = self.sensor
+        old_period, old_observed = self.period, self.observed_period
+        self.period = max(get_conversion_cycle_time(sensor._update_rate), sensor.get_meas_time())
+        # отличие частоты генератора датчика от расчетной сохраняется при смене настроек
+        self.observed_period = self.period * old_observed // old_period if old_period else self.period
+        self._last = None   # интервал до первого измерения с новыми настройками не учитывается
+        self._span = 0      # время от начала отсчета до последнего обнаружения (мкс)
+        self._periods = 0   # количество периодов от начала отсчета до последнего измерения
+        self._lag = 0       # задержка последнего измерения относительно расчетного момента (мкс)
+        self._behind = False
+        self._best_span = 0     # измерение-кандидат в начало отсчета: время и количество периодов от начала
+        self._best_periods = 0  # отсчета, задержка относительно расчетного момента
+        self._best_lag = 0
+        # задержка обнаружения первого измерения неизвестна, поэтому уточнение периода начинается
+        # от первого переноса начала отсчета
+        self._fitting = False
+        self._restart_fit()
+
+    def put(self, ticks: int):
+        """Учитывает измерение, полученное в момент ticks (значение compat.ticks_us())"""
+        self.delivered += 1
+        last, self._last = self._last, ticks
+        if last is None:
+            return
+        dt = compat.ticks_diff(ticks, last)
+        self.elapsed_us += dt
+        self._intervals += 1
+        period = self.observed_period
+        span = self._span + dt
+        # задержка обнаружения - от 0 до периода, поэтому количество периодов от начала отсчета округляется вниз,
+        # с небольшим запасом на разброс задержки. Измерение, обнаруженное раньше расчетного момента, - следующее
+        # по порядку
+        guard = period >> OverrunMonitor.GUARD_SHIFT
+        total = (span + guard) // period
+        if total <= self._periods:
+            total = self._periods + 1
+        periods = total - self._periods
+        lag = span - total * period     # задержка обнаружения относительно расчетного момента
+        prev_lag, self._lag = self._lag, lag
+        behind = 1 == periods and lag >= period - (period >> OverrunMonitor.LAG_SHIFT)
+        if behind and (self._behind and lag < prev_lag or prev_lag < -guard):
+            # задержка почти в период, которая уменьшается от измерения к измерению или следует за
+            # измерением раньше расчетного момента: наблюдаемый период больше действительного, и пропуск
+            # перед измерением не был учтен
+            total += 1
+            periods = 2
+            lag -= period
+            behind = False
+        self._behind = behind
+        # кандидат в начало отсчета - измерение с наименьшим отношением задержки к количеству периодов
+        best = self._best_periods
+        if not best or lag * best <= self._best_lag * total:
+            self._best_span = span
+            self._best_periods = best = total
+            self._best_lag = lag
+        if lag < 0 or total >= OverrunMonitor.REBASE:
+            # перенос начала отсчета к кандидату
+            fit_span = self._fit_span + self._best_span
+            fit_periods = self._fit_periods + best
+            if not self._fitting:
+                self._fitting = True
+                fit_span = fit_periods = 0
+            # измерения раньше расчетного момента отбираются по задержке, поэтому по ним период уточняется
+            # лишь на большом промежутке
+            fit_limit = 2 * OverrunMonitor.REBASE if lag < 0 else OverrunMonitor.REBASE
+            if fit_periods >= (fit_limit if lag < 0 else OverrunMonitor.FIT_PERIODS):
+                weight = OverrunMonitor.REBASE
+                period = (fit_span + weight * self._prior) // (fit_periods + weight)
+                limit = self.period >> 2
+                if period < self.period - limit:
+                    period = self.period - limit
+                elif period > self.period + limit:
+                    period = self.period + limit
+                self.observed_period = period
+            if fit_periods >= fit_limit:
+                self._restart_fit()
+            else:
+                self._fit_span = fit_span
+                self._fit_periods = fit_periods
+            span -= self._best_span
+            total -= best
+            self._best_periods = 0
+            if total:
+                # последнее измерение - кандидат в следующее начало отсчета
+                self._best_span = span
+                self._best_periods = total
+                self._best_lag = span - total * period
+        self._span = span
+        self._periods = total
+        lost = periods - 1
+        if lost:
+            self.dropped += lost
+            self.overruns += 1
+            self._win_dropped += lost
+        self._win_expected += periods
+        if self._win_expected >= self.window:
+            if self.max_drop_ratio and self._win_dropped > self.max_drop_ratio * self._win_expected:
+                self.step_down()
+            self._win_expected = 0
+            self._win_dropped = 0
+
+    def put_block(self, ticks, count: int = 0):
+        """Учитывает count измерений с метками времени из массива ticks (0 - весь массив)"""
+        if count <= 0:
+            count = len(ticks)
+        put = self.put
+        for i in range(count):
+            put(ticks[i])
+
+    def step_down(self) -> bool:
+        """Уменьшает частоту обновления датчика вдвое и перезапускает периодические измерения.
+        Возвращает Ложь, если частота уже наименьшая."""
+        sensor = self.sensor
+        update_rate = sensor._update_rate
+        if update_rate >= 13:
+            return False
+        sensor._set_update_rate(update_rate + 1)
+        sensor._update_reg(regs.CMM, True, start=1)     # перезапуск с новой частотой
+        self.rate_changes += 1
+        self.update_period()
+        return True
+
+    def get_expected(self) -> int:
+        """Возвращает ожидаемое количество измерений (полученные и пропущенные)"""
+        return self.delivered + self.dropped
+
+    def get_drop_ratio(self) -> float:
+        """Возвращает долю пропущенных измерений"""
+        expected = self.get_expected()
+        return self.dropped / expected if expected else 0.0
+
+    def get_effective_rate(self) -> float:
+        """Возвращает фактическую частоту получения измерений (Гц)"""
+        if self.elapsed_us <= 0:
+            return 0.0
+        return 1_000_000 * self._intervals / self.elapsed_us
+
+
+class RM3100Array:
+    """Синхронные однократные измерения группой датчиков (например, четыре датчика с адресами 0x20..0x23
+    на одной шине I2C для градиентометра). Измерения запускаются на всех датчиках подряд, одной записью
+    в регистр POLL каждого, поэтому расхождение во времени между датчиками равно длительности одной транзакции.
+    Затем ожидание окончания самого долгого измерения (RM3100.get_meas_time) и считывание результатов
+    по очереди, одной транзакцией из 9 байт с каждого датчика.
+
+    Synchronized single measurements by a group of sensors on one bus."""
+
+    def __init__(self, sensors, axis: [set, str] = "XYZ"):
+        """sensors - последовательность экземпляров RM3100; axis - оси измерения (смотри start_measure)"""
+        if not sensors:
+            raise ValueError("No sensors!")
+        self.sensors = tuple(sensors)
+        self._axes = _axis_to_int(axis)
+        self._poll = regs.POLL.make(axes=self._axes)
+        # кадр результатов: x, y, z первого датчика, x, y, z второго и т. д.
+        self.frames = array.array("i", (0 for _ in range(3 * len(self.sensors))))
+        # значение compat.ticks_us() в момент запуска последних измерений
+        self.timestamp = 0
+        for sensor in self.sensors:
+            sensor._update_reg(regs.CMM, start=0)  # Continuous Measurement Mode disabled
+
+    def __len__(self) -> int:
+        return len(self.sensors)
+
+    def measure(self, frames=None, wait_func=None):
+        """Запускает измерение на всех датчиках, ожидает и считывает результаты в frames (array('i') длиной
+        не менее 3 * len(self)), или во внутренний self.frames, если frames is None.
+        wait_func() вызывается между опросами STATUS (если не None). Возвращает массив с результатами.
+        Значение compat.ticks_us() в момент запуска измерений сохраняется в self.timestamp."""
+        if frames is None:
+            frames = self.frames
+        if len(frames) < 3 * len(self.sensors):
+            raise ValueError(f"Array too small for {len(self.sensors)} sensors: {len(frames)}")
+        poll = self._poll
+        axes = self._axes
+        # время измерения - до запуска: get_meas_time может прочитать CCR по шине, а между записями
+        # в POLL не должно быть других транзакций
+        wait = 0
+        for sensor in self.sensors:
+            meas_time = sensor.get_meas_time(axes)
+            if meas_time > wait:
+                wait = meas_time
+        for sensor in self.sensors:
+            sensor._write_reg(regs.POLL.address, poll)   # запуск однократного измерения
+        self.timestamp = compat.ticks_us()
+        wait -= 20 + (wait >> 4)    # запас на погрешность модели времени измерения
+        if wait > 0:
+            compat.sleep_us(wait)
+        decode_into = int24.decode_into
+        for index, sensor in enumerate(self.sensors):
+            while not sensor._is_drdy():
+                if wait_func is not None:
+                    wait_func()
+            buf = sensor._buf_9
+            sensor.read_buf_from_mem(regs.MX.address, buf)
+            decode_into(buf, frames, 3, 3 * index)
+        return frames
+
+
+class DrdyReader:
+    """Считывание результатов измерений по прерыванию от вывода DRDY датчика в кольцевой буфер.
+    Обработчик прерывания запоминает время (ticks_us) и планирует (micropython.schedule) чтение 9 байт
+    регистров MX, MY, MZ, поэтому на каждое измерение приходится одна транзакция по шине без опроса STATUS.
+    Основной цикл программы забирает накопленные измерения методом read_into.
+    Датчик должен работать в режиме периодических измерений (start_measure(..., single_mode=False)),
+    а в регистре HSHAKE должен быть установлен бит DRC1 (смотри RM3100.setup), чтобы чтение результатов
+    сбрасывало DRDY.
+
+    Reading measurement results into a ring buffer on the sensor DRDY pin interrupt.
+    One bus transaction per measurement, no STATUS polling."""
+
+    def __init__(self, sensor: RM3100, pin_drdy, capacity: int = 64):
+        """pin_drdy - вывод MCU (machine.Pin, настроенный на вход), к которому подключен вывод DRDY датчика.
+        capacity - емкость кольцевого буфера в измерениях (по три оси)."""
+        self.sensor = sensor
+        self.pin = pin_drdy
+        self.ring = ringbuf.SampleBuffer(capacity)
+        self._pending = False
+        self._ticks = 0     # время фронта DRDY
+        # функция без параметров, вызываемая после помещения измерения в буфер (например, ThreadSafeFlag.set)
+        self.callback = None
+        # ссылки на связанные методы создаются один раз, иначе каждое прерывание размещало бы объект в куче
+        self._irq_ref = self._irq
+        self._read_ref = self._read
+
+    def start(self):
+        """Разрешает прерывание от вывода DRDY"""
+        self.ring.clear()
+        self.pin.irq(handler=self._irq_ref, trigger=self.pin.IRQ_RISING)
+        if self.pin.value():
+            # DRDY уже установлен, фронта не будет, пока результат не прочитан
+            self._irq(self.pin)
+
+    def stop(self):
+        """Запрещает прерывание от вывода DRDY"""
+        self.pin.irq(handler=None)
+
+    def _irq(self, pin):
+        self._ticks = compat.ticks_us()
+        if not self._pending:
+            self._pending = True
+            micropython.schedule(self._read_ref, 0)
+
+    def _read(self, _):
+        self._pending = False
+        sensor = self.sensor
+        buf = sensor._buf_9
+        # результат считывается всегда, даже при полном буфере, иначе DRDY не сбросится
+        sensor.adapter.read_buf_from_mem(sensor.address, regs.MX.address, buf)
+        ring = self.ring
+        slot = ring.reserve()
+        if slot >= 0:
+            decode = int24.decode
+            ring.x[slot] = decode(buf, 0)
+            ring.y[slot] = decode(buf, 3)
+            ring.z[slot] = decode(buf, 6)
+            ring.ticks[slot] = self._ticks
+            ring.commit()
+        if self.callback is not None:
+            self.callback()
+
+    def __len__(self) -> int:
+        return len(self.ring)
+
+    def read_into(self, samples, max_count: int = 0, ticks=None) -> int:
+        """Переносит накопленные измерения в массив samples (array('i')): x0, y0, z0, x1, y1, z1, ...
+        и их метки времени (значения ticks_us() на фронте DRDY) в массив ticks (array('I')), если не None.
+        Возвращает количество перенесенных измерений."""
+        return self.ring.get_into(samples, ticks, max_count)
+
+    def get_overflows(self) -> int:
+        """Возвращает количество измерений, потерянных из-за переполнения кольцевого буфера"""
+        return self.ring.overflows
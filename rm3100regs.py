@@ -0,0 +1,63 @@
+"""Карта регистров RM3100: адреса и битовые поля (sensor_pack.bitfield.BitField).
+Маски полей вычисляются один раз при импорте модуля.
+RM3100 register map: addresses and bit fields. Field masks are computed once, at import."""
+# MicroPython
+# mail: goctaprog@gmail.com
+# MIT license
+from sensor_pack.bitfield import BitField
+
+
+class Register:
+    """Описание регистра: адрес, биты, которые всегда записываются единицами (fixed), и битовые поля.
+    Register description: address, bits that are always written as ones (fixed) and bit fields."""
+
+    def __init__(self, address: int, fields: tuple = (), fixed: int = 0):
+        self.address = address
+        self.fixed = fixed
+        self.fields = {field.alias: field for field in fields}
+
+    def put(self, source: int, **values) -> int:
+        """Записывает значения нескольких полей (имя=значение) в значение регистра source.
+        Возвращает новое значение регистра. Writes several fields (name=value) into source."""
+        fields = self.fields
+        for name, value in values.items():
+            source = fields[name].put(source, value)
+        return source
+
+    def make(self, **values) -> int:
+        """Возвращает значение регистра из значений полей (имя=значение). Остальные поля равны нулю."""
+        return self.put(self.fixed, **values)
+
+    def get(self, source: int, name: str) -> int:
+        """Возвращает значение поля name из значения регистра source"""
+        return self.fields[name].get(source)
+
+
+# Initiates a single measurement
+POLL = Register(0x00, (BitField(4, 6, "axes"),))
+# Initiates continuous measurement mode
+CMM = Register(0x01, (BitField(0, 0, "start"), BitField(2, 3, "drdm"), BitField(4, 6, "axes")))
+# Cycle Count Registers X, Y, Z (16 бит, big endian)
+CCR_X = Register(0x04)
+CCR_Y = Register(0x06)
+CCR_Z = Register(0x08)
+# Continuous Mode Update Rate: 0x92 (600 Гц) .. 0x9F (~0.075 Гц), биты 4 и 7 всегда равны 1
+TMRC = Register(0x0B, (BitField(0, 3, "rate"),), 0x90)
+# Measurement Results X, Y, Z (int24, big endian)
+MX = Register(0x24)
+MY = Register(0x27)
+MZ = Register(0x2A)
+# Built-In Self Test
+BIST = Register(0x33, (BitField(0, 1, "bp"), BitField(2, 3, "bw"), BitField(4, 6, "axes"), BitField(7, 7, "ste")))
+# Status of DRDY
+STATUS = Register(0x34, (BitField(7, 7, "drdy"),))
+# Handshake: DRC0 - DRDY сбрасывается любой записью в регистр, DRC1 - чтением результатов измерений.
+# Биты NACK 4..6 устанавливает сам датчик, бит 3 всегда равен 1
+HSHAKE = Register(0x35, (BitField(0, 0, "drc0"), BitField(1, 1, "drc1"), BitField(4, 6, "nack")), 0x08)
+# MagI2C Revision Identification
+REVID = Register(0x36)
+
+# смещение значения поля TMRC.rate относительно номера частоты обновления (update_rate 0 - поле rate 2)
+TMRC_RATE_OFFSET = 2
+# маска бита DRDY регистра STATUS, для быстрых проверок без обращения к словарю полей
+DRDY_MASK = STATUS.fields["drdy"].bitmask
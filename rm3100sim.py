@@ -0,0 +1,638 @@
+"""Имитатор датчика RM3100 для проверки драйвера без оборудования (на ПК или в CI).
+Simulated RM3100 sensor for checking the driver without hardware (on a PC or in CI).
+
+Состав:
+    VirtualClock - виртуальные часы (микросекунды). Шина сдвигает их на время каждой транзакции;
+    RM3100Model - регистровая модель датчика (POLL, CMM, CCR, TMRC, MX/MY/MZ, BIST, STATUS, HSHAKE, REVID);
+    SimI2C - заменитель machine.I2C, передается в bus_service.I2cAdapter;
+    SimSPI - заменитель machine.SPI, передается в bus_service.SpiAdapter, выбор кристалла через SimPin;
+    ReplayAdapter - адаптер шины, воспроизводящий запись измерений (rm3100log);
+    check_overrun_monitor - проверка учета пропущенных измерений (rm3100mod.OverrunMonitor).
+
+Пример (драйвер ждет и ставит метки времени по виртуальным часам, смотри compat.set_clock):
+    clock = VirtualClock()
+    compat.set_clock(clock)
+    model = RM3100Model(clock, source=sine_field((1000, 0, 0), 50))
+    sensor = rm3100mod.RM3100(I2cAdapter(SimI2C(clock, {0x20: model})))
+    # SPI
+    spi = SimSPI(clock)
+    sensor = rm3100mod.RM3100(SpiAdapter(spi), address=spi.attach(RM3100Model(clock)))
+    ...
+    compat.set_clock(None)  # возврат к реальному времени
+    # воспроизведение записи
+    with open("mag.bin", "rb") as f:
+        sensor = rm3100mod.RM3100(ReplayAdapter(f, realtime=False))"""
+# MicroPython
+# mail: goctaprog@gmail.com
+# MIT license
+import math
+import rm3100log
+from sensor_pack import compat
+from sensor_pack.bus_service import BusAdapter
+
+# адреса регистров RM3100
+_POLL = 0x00
+_CMM = 0x01
+_CCR = 0x04
+_TMRC = 0x0B
+_MX = 0x24
+_BIST = 0x33
+_STATUS = 0x34
+_HSHAKE = 0x35
+_REVID = 0x36
+# регистры только для чтения
+_READ_ONLY = tuple(range(_MX, _MX + 9)) + (_STATUS, _REVID)
+
+_INT24_MIN = -(1 << 23)
+_INT24_MAX = (1 << 23) - 1
+
+
+def _axis_conversion_time(cycle_count: int) -> int:
+    """Время измерения по одной оси в микросекундах. Аппроксимация Table 3-1 документации:
+    50 циклов - 1600 Hz, 100 - 850 Hz, 200 - 440 Hz для одной оси."""
+    return 75 + 11 * cycle_count
+
+
+def _tmrc_period(tmrc: int) -> int:
+    """Период обновления в режиме CMM (мкс) по значению регистра TMRC (0x92..0x9F)"""
+    return 1667 * 2 ** (min(max(tmrc, 0x92), 0x9F) - 0x92)
+
+
+def constant_field(x: int, y: int, z: int):
+    """Источник постоянного поля (в отсчетах АЦП)"""
+    def _source(t_us: int) -> tuple:
+        return x, y, z
+    return _source
+
+
+def sine_field(amplitude: tuple, freq_hz: float, offset: tuple = (0, 0, 0)):
+    """Источник синусоидального поля (в отсчетах АЦП), например помеха от сети 50 Гц.
+    amplitude, offset - кортежи из трех значений для осей X, Y, Z."""
+    w = 2 * math.pi * freq_hz / 1_000_000
+
+    def _source(t_us: int) -> tuple:
+        s = math.sin(w * t_us)
+        return tuple(int(offset[i] + amplitude[i] * s) for i in range(3))
+    return _source
+
+
+class VirtualClock:
+    """Виртуальные часы с разрешением 1 мкс. Время идет только при вызове advance/sleep_us/sleep_ms
+    и при транзакциях имитаторов шины. Методы ticks_xx повторяют модуль time MicroPython."""
+    TICKS_MAX = (1 << 30) - 1
+
+    def __init__(self, start_us: int = 0):
+        self.now = start_us
+        self._listeners = []
+
+    def subscribe(self, callback, next_event=None):
+        """callback() вызывается после каждого сдвига времени.
+        next_event() возвращает время ближайшего события модели (мкс) или None. Часы останавливаются
+        на каждом таком событии, поэтому длинная пауза не пропускает промежуточные измерения."""
+        self._listeners.append((callback, next_event))
+
+    def _get_next_event(self):
+        result = None
+        for _, next_event in self._listeners:
+            t = None if next_event is None else next_event()
+            if t is not None and (result is None or t < result):
+                result = t
+        return result
+
+    def _notify(self):
+        for callback, _ in self._listeners:
+            callback()
+
+    def advance(self, us: int):
+        if us < 0:
+            raise ValueError(f"Invalid time delta: {us}")
+        target = self.now + us
+        while True:
+            t = self._get_next_event()
+            if t is None or t > target:
+                break
+            self.now = max(self.now, t)
+            self._notify()
+        # обработчики событий могли сами сдвинуть время (транзакции по шине)
+        self.now = max(self.now, target)
+        self._notify()
+
+    def sleep_us(self, us: int):
+        self.advance(us)
+
+    def sleep_ms(self, ms: int):
+        self.advance(1_000 * ms)
+
+    def ticks_us(self) -> int:
+        return self.now & VirtualClock.TICKS_MAX
+
+    def ticks_ms(self) -> int:
+        return (self.now // 1_000) & VirtualClock.TICKS_MAX
+
+    @staticmethod
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        half = (VirtualClock.TICKS_MAX + 1) // 2
+        return ((ticks1 - ticks2 + half) & VirtualClock.TICKS_MAX) - half
+
+    @staticmethod
+    def ticks_add(ticks: int, delta: int) -> int:
+        return (ticks + delta) & VirtualClock.TICKS_MAX
+
+
+class RM3100Model:
+    """Регистровая модель RM3100. Учитывает количество циклов по осям (CCR), частоту обновления (TMRC),
+    режимы однократных (POLL) и периодических (CMM) измерений, флаг DRDY и его сброс (HSHAKE).
+    source - источник поля: функция source(t_us) -> (x, y, z) или итерируемый объект с записанными
+    значениями (x, y, z). После исчерпания записи последнее значение повторяется.
+    period_scale - отношение периодов имитатора (времени измерения и периода TMRC) к расчетным, например 1.02 -
+    генератор датчика на 2% медленнее модели драйвера (у настоящих датчиков частота известна приблизительно)."""
+
+    def __init__(self, clock: VirtualClock, source=None, revid: int = 0x22, period_scale: float = 1.0):
+        self.clock = clock
+        self.period_scale = period_scale
+        self.regs = bytearray(_REVID + 1)
+        self.regs[_CCR:_CCR + 6] = b"\x00\xC8\x00\xC8\x00\xC8"     # 200 циклов по каждой оси
+        self.regs[_TMRC] = 0x96
+        self.regs[_HSHAKE] = 0x1B
+        self.regs[_REVID] = revid
+        if source is None:
+            source = constant_field(1500, -800, 3700)
+        self._func = source if callable(source) else None
+        self._iter = None if callable(source) else iter(source)
+        self._last = 0, 0, 0
+        # время окончания однократного измерения или None
+        self._single_deadline = None
+        self._single_axes = 0
+        # время следующего периодического измерения или None
+        self._next_sample = None
+        # статистика
+        self.samples = 0        # количество измерений
+        self.overwritten = 0    # количество измерений, не считанных до появления следующего
+        self.pin_drdy = None    # вывод DRDY, если нужен (SimPin)
+        clock.subscribe(self.update, self.get_next_event)
+
+    def get_next_event(self):
+        """Время ближайшего окончания измерения (мкс) или None"""
+        if self._single_deadline is None:
+            return self._next_sample
+        if self._next_sample is None:
+            return self._single_deadline
+        return min(self._single_deadline, self._next_sample)
+
+    def _get_ccr(self, axis: int) -> int:
+        addr = _CCR + 2 * axis
+        return (self.regs[addr] << 8) | self.regs[addr + 1]
+
+    def get_conversion_time(self, axes: int) -> int:
+        """Время измерения (мкс) по осям из битовой маски axes (бит 0 - X, 1 - Y, 2 - Z)"""
+        t = sum(_axis_conversion_time(self._get_ccr(i)) for i in range(3) if axes & (1 << i))
+        return round(t * self.period_scale)
+
+    def get_cmm_period(self) -> int:
+        """Период измерений в режиме CMM. Датчик не может измерять быстрее, чем позволяют CCR!"""
+        axes = (self.regs[_CMM] >> 4) & 0x07
+        return max(round(_tmrc_period(self.regs[_TMRC]) * self.period_scale), self.get_conversion_time(axes))
+
+    def is_continuous(self) -> bool:
+        return 0 != self.regs[_CMM] & 0x01
+
+    def _next_field(self, t_us: int) -> tuple:
+        if self._func is not None:
+            self._last = self._func(t_us)
+        else:
+            try:
+                self._last = next(self._iter)
+            except StopIteration:
+                pass
+        return self._last
+
+    def _set_drdy(self, value: bool):
+        if value:
+            self.regs[_STATUS] |= 0x80
+        else:
+            self.regs[_STATUS] &= 0x7F
+        if self.pin_drdy is not None:
+            self.pin_drdy.value(value)
+
+    def _latch(self, axes: int, t_us: int):
+        """Запись результата измерения в регистры MX, MY, MZ"""
+        if self.regs[_STATUS] & 0x80:
+            self.overwritten += 1
+        field = self._next_field(t_us)
+        for i in range(3):
+            if axes & (1 << i):
+                val = min(max(int(field[i]), _INT24_MIN), _INT24_MAX) & 0xFFFFFF
+                addr = _MX + 3 * i
+                self.regs[addr:addr + 3] = val.to_bytes(3, "big")
+        self.samples += 1
+        self._set_drdy(True)
+
+    def update(self):
+        """Приводит состояние модели к текущему времени часов"""
+        now = self.clock.now
+        if self._single_deadline is not None and now >= self._single_deadline:
+            self._single_deadline = None
+            self._latch(self._single_axes, now)
+        if self._next_sample is not None and now >= self._next_sample:
+            period = self.get_cmm_period()
+            missed = (now - self._next_sample) // period    # пропущенные периоды
+            if missed:
+                self.overwritten += missed
+                self.samples += missed
+            t = self._next_sample + missed * period
+            # время следующего измерения изменяется до записи результата, так как обработчик прерывания
+            # от вывода DRDY может обратиться к модели повторно
+            self._next_sample = t + period
+            self._latch((self.regs[_CMM] >> 4) & 0x07, t)
+
+    def read(self, reg_addr: int, count: int) -> bytes:
+        """Чтение count байт, начиная с reg_addr (адрес увеличивается автоматически)"""
+        self.update()
+        end = reg_addr + count
+        if end > len(self.regs):
+            raise OSError(5)    # EIO
+        result = bytes(self.regs[reg_addr:end])
+        # DRC1: DRDY сбрасывается после чтения результатов измерений
+        if self.regs[_HSHAKE] & 0x02 and reg_addr < _MX + 9 and end > _MX:
+            self._set_drdy(False)
+        return result
+
+    def write(self, reg_addr: int, data):
+        """Запись байтов data, начиная с reg_addr (адрес увеличивается автоматически)"""
+        self.update()
+        if reg_addr + len(data) > len(self.regs):
+            raise OSError(5)    # EIO
+        for offset, value in enumerate(data):
+            self._write_byte(reg_addr + offset, value)
+        # DRC0: DRDY сбрасывается после любой записи в регистр
+        if self.regs[_HSHAKE] & 0x01:
+            self._set_drdy(False)
+
+    def _write_byte(self, addr: int, value: int):
+        if addr in _READ_ONLY:
+            return
+        if _HSHAKE == addr:
+            # биты NACK только для чтения
+            self.regs[addr] = (self.regs[addr] & 0x70) | (value & 0x8F)
+            return
+        self.regs[addr] = value
+        now = self.clock.now
+        if _POLL == addr:
+            axes = (value >> 4) & 0x07
+            if self.regs[_BIST] & 0x80:
+                self._self_test(axes)
+            elif axes:
+                self._set_drdy(False)
+                self._single_axes = axes
+                self._single_deadline = now + self.get_conversion_time(axes)
+            return
+        if _CMM == addr:
+            if value & 0x01:
+                self._set_drdy(False)
+                self._next_sample = now + self.get_cmm_period()
+            else:
+                self._next_sample = None
+
+    def _self_test(self, axes: int):
+        """Встроенная самопроверка завершается сразу и всегда успешно по запрошенным осям"""
+        self.regs[_BIST] = (self.regs[_BIST] & 0x8F) | (axes << 4)
+        self._set_drdy(True)
+
+
+class SimPin:
+    """Заменитель machine.Pin для выбора кристалла (SPI) и вывода DRDY.
+    Поддерживает обработчик прерывания по фронтам, который вызывается сразу (как в CPython-версии
+    micropython.schedule из sensor_pack.compat)."""
+    IN = 0
+    OUT = 1
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def __init__(self, value: int = 0, on_change=None):
+        self._value = value
+        self._on_change = on_change
+        self._handler = None
+        self._trigger = 0
+
+    def irq(self, handler=None, trigger: int = IRQ_RISING):
+        self._handler = handler
+        self._trigger = trigger
+
+    def value(self, val=None):
+        if val is None:
+            return self._value
+        val = 1 if val else 0
+        old, self._value = self._value, val
+        if old == val:
+            return
+        if self._on_change is not None:
+            self._on_change(val)
+        edge = SimPin.IRQ_RISING if val else SimPin.IRQ_FALLING
+        if self._handler is not None and self._trigger & edge:
+            self._handler(self)
+
+    def __call__(self, val=None):
+        return self.value(val)
+
+    def low(self):
+        self.value(0)
+
+    def high(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def on(self):
+        self.value(1)
+
+
+class _SimBus:
+    """Общая часть имитаторов шин: статистика транзакций и расчет их длительности"""
+
+    def __init__(self, clock: VirtualClock, freq: int, bits_per_byte: int):
+        self.clock = clock
+        self.freq = freq
+        self._bits_per_byte = bits_per_byte
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.transactions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def _account(self, n_written: int, n_read: int, overhead_bits: int = 0, new_transaction: bool = True):
+        """Учет транзакции и сдвиг виртуального времени на ее длительность"""
+        if new_transaction:
+            self.transactions += 1
+        self.bytes_written += n_written
+        self.bytes_read += n_read
+        bits = self._bits_per_byte * (n_written + n_read) + overhead_bits
+        self.clock.advance(1 + 1_000_000 * bits // self.freq)
+
+
+class SimI2C(_SimBus):
+    """Заменитель machine.I2C. devices - словарь {адрес на шине: RM3100Model}.
+    Длительность транзакции: 9 бит на байт (8 бит + ACK) плюс START/STOP/повторный START."""
+
+    def __init__(self, clock: VirtualClock, devices: dict, freq: int = 400_000):
+        super().__init__(clock, freq, 9)
+        self.devices = devices
+        self._pointer = {addr: 0 for addr in devices}   # внутренний указатель регистра каждого устройства
+
+    def _get(self, addr: int) -> RM3100Model:
+        try:
+            return self.devices[addr]
+        except KeyError:
+            self._account(1, 0, 2)
+            raise OSError(19) from None     # ENODEV, как в MicroPython
+
+    def scan(self) -> list:
+        return sorted(self.devices)
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, *, addrsize: int = 8) -> bytes:
+        dev = self._get(addr)
+        self._account(3, nbytes, 3)
+        return dev.read(memaddr, nbytes)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, *, addrsize: int = 8):
+        dev = self._get(addr)
+        self._account(3, len(buf), 3)
+        buf[:] = dev.read(memaddr, len(buf))
+
+    def writeto_mem(self, addr: int, memaddr: int, buf, *, addrsize: int = 8):
+        dev = self._get(addr)
+        self._account(2 + len(buf), 0, 2)
+        dev.write(memaddr, buf)
+
+    def readfrom(self, addr: int, nbytes: int, stop: bool = True) -> bytes:
+        dev = self._get(addr)
+        self._account(1, nbytes, 2)
+        pointer = self._pointer[addr]
+        self._pointer[addr] = pointer + nbytes
+        return dev.read(pointer, nbytes)
+
+    def readfrom_into(self, addr: int, buf, stop: bool = True):
+        buf[:] = self.readfrom(addr, len(buf), stop)
+
+    def writeto(self, addr: int, buf, stop: bool = True) -> int:
+        dev = self._get(addr)
+        self._account(1 + len(buf), 0, 2)
+        if buf:
+            self._pointer[addr] = buf[0]
+            if len(buf) > 1:
+                dev.write(buf[0], buf[1:])
+        return len(buf)
+
+
+class SimSPI(_SimBus):
+    """Заменитель machine.SPI. Устройство подключается методом attach, который возвращает вывод выбора
+    кристалла (SimPin). Протокол RM3100: первый байт посылки - адрес регистра, старший бит которого равен 1
+    при чтении. Далее данные, адрес увеличивается автоматически.
+    Транзакцией считается посылка (от выбора кристалла до его снятия), а не вызов метода."""
+
+    def __init__(self, clock: VirtualClock, baudrate: int = 1_000_000):
+        super().__init__(clock, baudrate, 8)
+        self._selected = None   # выбранное устройство
+        self._addr = None       # адрес регистра в текущей посылке
+        self._reading = False
+
+    def attach(self, model: RM3100Model) -> SimPin:
+        """Подключает устройство к шине. Возвращает его вывод выбора кристалла (активный уровень низкий)"""
+        def _on_change(level: int):
+            self._addr = None
+            self._selected = None if level else model
+            if not level:
+                self.transactions += 1
+        return SimPin(1, _on_change)
+
+    def _xfer(self, out_byte: int) -> int:
+        dev = self._selected
+        if dev is None:
+            return 0xFF
+        if self._addr is None:
+            self._addr = out_byte & 0x7F
+            self._reading = 0 != out_byte & 0x80
+            return 0xFF
+        addr, self._addr = self._addr, self._addr + 1
+        if self._reading:
+            return dev.read(addr, 1)[0]
+        dev.write(addr, (out_byte,))
+        return 0xFF
+
+    def write(self, buf):
+        self._account(len(buf), 0, 0, False)
+        for b in buf:
+            self._xfer(b)
+
+    def read(self, nbytes: int, write: int = 0x00) -> bytes:
+        self._account(0, nbytes, 0, False)
+        return bytes(self._xfer(write) for _ in range(nbytes))
+
+    def readinto(self, buf, write: int = 0x00):
+        self._account(0, len(buf), 0, False)
+        for i in range(len(buf)):
+            buf[i] = self._xfer(write)
+
+    def write_readinto(self, write_buf, read_buf):
+        self._account(len(write_buf), 0, 0, False)
+        for i in range(len(write_buf)):
+            read_buf[i] = self._xfer(write_buf[i])
+
+
+class ReplayAdapter(BusAdapter):
+    """Заменитель адаптера шины (bus_service.BusAdapter), который воспроизводит запись (rm3100log) через тот же
+    путь драйвера, что и настоящий датчик: RM3100._get_all_meas_result, __next__, read_into, DrdyReader и далее.
+    Регистры MX, MY, MZ и STATUS (DRDY) выдаются из записи, остальные регистры хранятся как записаны драйвером
+    (CCR и TMRC изначально берутся из заголовка записи). Адрес устройства не проверяется.
+    realtime - если Истина, то очередное измерение становится доступно через тот же интервал времени, что и
+    при записи (по меткам времени), иначе сразу после считывания предыдущего (как можно быстрее).
+    clock - источник времени с методами ticks_us() и ticks_diff() (например, VirtualClock) или None
+    (sensor_pack.compat, реальное время).
+
+    Bus adapter that replays a recorded capture (rm3100log) through the driver: MX/MY/MZ and STATUS come
+    from the capture, at the original timing (realtime) or as fast as possible."""
+
+    def __init__(self, stream, realtime: bool = True, clock=None):
+        super().__init__(None)
+        header = rm3100log.read_header(stream)
+        self.header = header
+        self.realtime = realtime
+        self._ticks_us = compat.ticks_us if clock is None else clock.ticks_us
+        self._ticks_diff = compat.ticks_diff if clock is None else clock.ticks_diff
+        self._records = rm3100log.iter_records(stream, header)
+        self.regs = bytearray(_REVID + 1)
+        self.regs[_CCR:_CCR + 6] = b"".join(cc.to_bytes(2, "big") for cc in header.cycle_counts)
+        self.regs[_TMRC] = header.tmrc
+        self.regs[_HSHAKE] = 0x1B
+        self.regs[_REVID] = 0x22
+        self._next = None           # следующая запись (ticks, x, y, z) или None
+        self._next_time = 0         # время следующей записи от начала записи (мкс)
+        self._start = None          # значение ticks_us() начала воспроизведения
+        self._elapsed = 0           # время от начала воспроизведения (мкс)
+        self.finished = False       # Истина, когда запись исчерпана
+        # статистика
+        self.delivered = 0          # количество выданных (записанных в MX..MZ) измерений
+        self.overwritten = 0        # количество измерений, не считанных до появления следующего
+        self._fetch()
+
+    def _fetch(self):
+        """Читает следующую запись"""
+        prev = self._next
+        try:
+            self._next = next(self._records)
+        except StopIteration:
+            self._next = None
+            self.finished = True
+            return
+        if prev is not None:
+            self._next_time += (self._next[0] - prev[0]) & VirtualClock.TICKS_MAX
+
+    def _latch(self):
+        """Переносит следующую запись в регистры MX, MY, MZ и устанавливает DRDY"""
+        regs = self.regs
+        if regs[_STATUS] & 0x80:
+            self.overwritten += 1
+        _, x, y, z = self._next
+        for i, val in enumerate((x, y, z)):
+            addr = _MX + 3 * i
+            regs[addr:addr + 3] = (min(max(val, _INT24_MIN), _INT24_MAX) & 0xFFFFFF).to_bytes(3, "big")
+        regs[_STATUS] |= 0x80
+        self.delivered += 1
+        self._fetch()
+
+    def update(self):
+        """Приводит состояние регистров к текущему времени"""
+        if self._next is None:
+            return
+        if not self.realtime:
+            if not self.regs[_STATUS] & 0x80:
+                self._latch()
+            return
+        now = self._ticks_us()
+        if self._start is None:
+            self._start = now
+        # время накапливается по приращениям, поэтому воспроизведение может быть длиннее периода ticks_us()
+        self._elapsed += self._ticks_diff(now, self._start)
+        self._start = now
+        while self._next is not None and self._next_time <= self._elapsed:
+            self._latch()
+
+    def rewind_clock(self):
+        """Отсчет времени воспроизведения начинается заново: следующее измерение доступно сразу,
+        последующие - через записанные интервалы (например, после настройки датчика)"""
+        self._start = None
+        self._elapsed = self._next_time
+
+    def _read(self, reg_addr: int, count: int) -> bytes:
+        self.update()
+        end = reg_addr + count
+        if end > len(self.regs):
+            raise OSError(5)    # EIO
+        result = bytes(self.regs[reg_addr:end])
+        if reg_addr < _MX + 9 and end > _MX:
+            self.regs[_STATUS] &= 0x7F  # DRC1
+        return result
+
+    def _write(self, reg_addr: int, data):
+        if reg_addr + len(data) > len(self.regs):
+            raise OSError(5)    # EIO
+        for offset, value in enumerate(data):
+            if reg_addr + offset not in _READ_ONLY:
+                self.regs[reg_addr + offset] = value
+
+    def read_register(self, device_addr, reg_addr: int, bytes_count: int) -> bytes:
+        return self._read(reg_addr, bytes_count)
+
+    def read_buf_from_mem(self, device_addr, mem_addr: int, buf):
+        buf[:] = self._read(mem_addr, len(buf))
+
+    def write_register(self, device_addr, reg_addr: int, value: [int, bytes, bytearray],
+                       bytes_count: int, byte_order: str):
+        buf = value.to_bytes(bytes_count, byte_order) if isinstance(value, int) else value
+        self._write(reg_addr, buf)
+
+    def write_buf_to_mem(self, device_addr, mem_addr: int, buf):
+        self._write(mem_addr, buf)
+
+
+def check_overrun_monitor(period_scale: float = 1.0, pause: float = 0, random_pause: float = 0, count: int = 1000,
+                          poll_us: int = 50, update_rate: int = 0, cycle_count: int = 50, seed: int = 1) -> tuple:
+    """Проверка учета пропусков (rm3100mod.OverrunMonitor) на имитаторе: датчик в режиме периодических
+    измерений опрашивается через каждые poll_us мкс, после каждых 100 полученных измерений опрос
+    приостанавливается на pause периодов и еще на случайное время до random_pause периодов.
+    period_scale - отношение действительного периода имитатора к расчетному.
+    Возвращает (пропуски по OverrunMonitor, пропуски по имитатору, наблюдаемый период, действительный период).
+    Пример: check_overrun_monitor(1.05, pause=2.7) -> (9, 9, 1968, 1969).
+
+    Checks OverrunMonitor against the simulator: polls every poll_us, pausing after every 100 samples.
+    Returns (counted drops, actual drops, observed period, actual period)."""
+    import random
+    import rm3100mod
+    from sensor_pack.bus_service import I2cAdapter
+    clock = VirtualClock()
+    compat.set_clock(clock)
+    try:
+        model = RM3100Model(clock, period_scale=period_scale)
+        sensor = rm3100mod.RM3100(I2cAdapter(SimI2C(clock, {0x20: model})))
+        for axis in "xyz":
+            sensor.set_axis_cycle_count(axis, cycle_count)
+        sensor.start_measure("XYZ", update_rate=update_rate, single_mode=False)
+        monitor = rm3100mod.OverrunMonitor(sensor)
+        sensor.monitor = monitor
+        period = monitor.period
+        random.seed(seed)
+        received = 0
+        while received < count:
+            clock.advance(poll_us)
+            if next(sensor) is None:
+                continue
+            received += 1
+            if 1 == received:
+                # пропуски до первого измерения не учитываются
+                model.overwritten = 0
+            elif 0 == received % 100 and received < count:
+                clock.advance(int(pause * period) + int(random.uniform(0, random_pause) * period))
+        return monitor.dropped, model.overwritten, monitor.observed_period, model.get_cmm_period()
+    finally:
+        compat.set_clock(None)
@@ -0,0 +1,135 @@
+"""Асинхронное получение результатов измерений RM3100: uasyncio на MicroPython, asyncio на CPython.
+Asynchronous reading of RM3100 measurement results: uasyncio on MicroPython, asyncio on CPython.
+
+Пример/Example:
+    async def mag_task(sensor):
+        async for x, y, z in sensor.stream(axis="XYZ", update_rate=4):
+            print(x, y, z)"""
+# MicroPython
+# mail: goctaprog@gmail.com
+# MIT license
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import array
+import rm3100mod
+from sensor_pack import compat
+
+if hasattr(asyncio, "sleep_ms"):
+    def _async_sleep_us(us: int):
+        return asyncio.sleep_ms(us // 1_000)
+else:
+    def _async_sleep_us(us: int):
+        return asyncio.sleep(us / 1_000_000)
+
+
+def _sleep_us(us: int):
+    """Ожидание без занятия процессора. С виртуальными часами (compat.set_clock) время сдвигают часы,
+    а задача только уступает управление другим задачам."""
+    if compat.clock is not None:
+        compat.clock.sleep_us(us)
+        us = 0
+    return _async_sleep_us(us)
+
+
+class MeasStream:
+    """Асинхронный итератор результатов измерений (кортежей x, y, z).
+    Без вывода DRDY: ждет (не занимая процессор) время измерения (RM3100.get_meas_time), а в режиме периодических
+    измерений - не меньше периода TMRC (get_conversion_cycle_time), после чего опрашивает STATUS
+    с шагом в десятую часть этого времени. В режиме периодических измерений время ожидания отсчитывается от
+    обнаружения готовности предыдущего измерения (за вычетом шага опроса), а не от окончания его считывания.
+    С выводом DRDY (drdy - rm3100mod.DrdyReader): ждет события от обработчика прерывания и забирает измерения
+    из кольцевого буфера, не обращаясь к шине.
+    Asynchronous iterator of measurement results (x, y, z tuples)."""
+
+    def __init__(self, sensor: rm3100mod.RM3100, axis: [set, str] = "XYZ", update_rate: int = 6,
+                 single_mode: bool = False, drdy: rm3100mod.DrdyReader = None, count: int = 0):
+        """axis, update_rate, single_mode - смотри RM3100.start_measure. В режиме однократных измерений
+        каждое следующее измерение запускается после считывания предыдущего.
+        drdy - считыватель по прерыванию от вывода DRDY (только для режима периодических измерений) или None.
+        count - количество измерений, после которого итерация завершится (0 - бесконечно)."""
+        if drdy is not None and single_mode:
+            raise ValueError("DRDY reader requires continuous measurement mode!")
+        self.sensor = sensor
+        self.axis = axis
+        self.update_rate = update_rate
+        self.single_mode = single_mode
+        self.drdy = drdy
+        self.count = count
+        self._wait_us = 0
+        self._poll_us = 0
+        self._deadline = 0      # значение compat.ticks_us(), до которого ожидание без опроса STATUS
+        self._delivered = 0
+        self._started = False
+        self._sample = array.array("i", (0, 0, 0))
+        self._flag = None
+        if drdy is not None:
+            # ThreadSafeFlag (uasyncio) можно устанавливать вне задач asyncio, Event - его замена для CPython
+            self._flag = asyncio.ThreadSafeFlag() if hasattr(asyncio, "ThreadSafeFlag") else asyncio.Event()
+            drdy.callback = self._flag.set
+
+    def _start(self):
+        sensor = self.sensor
+        sensor.start_measure(axis=self.axis, update_rate=self.update_rate, single_mode=self.single_mode)
+        self._wait_us = sensor.get_meas_time()
+        if not self.single_mode:
+            self._wait_us = max(self._wait_us, rm3100mod.get_conversion_cycle_time(self.update_rate))
+        self._poll_us = self._wait_us // 10
+        self._deadline = compat.ticks_add(compat.ticks_us(), self._wait_us)
+        if self.drdy is not None:
+            self.drdy.start()
+        self._started = True
+
+    def stop(self):
+        """Прекращает периодические измерения (датчик переводится в режим однократных измерений)"""
+        if self.drdy is not None:
+            self.drdy.stop()
+            self.drdy.callback = None
+        self.sensor.start_measure(axis="", single_mode=True)
+        self._started = False
+
+    def __aiter__(self):
+        return self
+
+    async def _wait_drdy(self) -> tuple:
+        sample = self._sample
+        while 0 == self.drdy.read_into(sample, 1):
+            if compat.clock is not None:
+                # виртуальные часы идут только при ожидании: без сдвига времени прерывания от DRDY не будет
+                await _sleep_us(self._poll_us)
+            else:
+                await self._flag.wait()
+            if hasattr(self._flag, "clear"):
+                self._flag.clear()
+        return sample[0], sample[1], sample[2]
+
+    async def _wait_poll(self) -> tuple:
+        sensor = self.sensor
+        remaining = compat.ticks_diff(self._deadline, compat.ticks_us())
+        if remaining > 0:
+            await _sleep_us(remaining)
+        while not sensor.is_data_ready():
+            await _sleep_us(self._poll_us)
+        if not self.single_mode:
+            # следующее измерение будет готово через период после текущего, а оно обнаружено с задержкой
+            # не больше шага опроса
+            self._deadline = compat.ticks_add(compat.ticks_us(), self._wait_us - self._poll_us)
+        result = sensor.get_axis(-1)
+        if self.single_mode:
+            sensor.start_measure(axis=self.axis, single_mode=True)  # следующее измерение
+            self._deadline = compat.ticks_add(compat.ticks_us(), self._wait_us)
+        return result
+
+    async def __anext__(self) -> tuple:
+        if self.count and self._delivered >= self.count:
+            self.stop()
+            raise StopAsyncIteration
+        if not self._started:
+            self._start()
+        if self.drdy is None:
+            result = await self._wait_poll()
+        else:
+            result = await self._wait_drdy()
+        self._delivered += 1
+        return result
@@ -4,8 +4,13 @@ Copyright (c) 2022 Roman Shevchik
 
 Усреднитель/Averager.
 Хорошо подходит для усреденения физических величин, считанных с датчиков (температура, давление, влажность).
-Well suited for averaging physical quantities read from sensors (temperature, pressure, humidity)."""
+Well suited for averaging physical quantities read from sensors (temperature, pressure, humidity).
+
+VectorAverager, EmaFilter, MedianFilter - фильтры для нескольких каналов сразу (например, X, Y, Z магнитометра)
+с постоянным объемом памяти и постоянным временем обработки значения.
+Filters for several channels at once (for example, magnetometer X, Y, Z) with fixed memory."""
 import array
+from sensor_pack.compat import micropython
 
 
 class Averager:
@@ -21,12 +26,17 @@ class Averager:
         self._max = items_count
         self._index = 0
         self._cnt = 0
+        self._sum = 0   # сумма элементов arr, обновляется при каждом put
         self.arr = array.array(type_code, [0 for _ in range(items_count)])
 
     def put(self, value: int) -> int:
         """Возвращает среднее арифметическое, основанное на сумме накопленных элементов.
         Returns the arithmetic mean based on the sum of the accumulated elements."""
+        # сначала запись в массив: если значение не помещается в тип элемента (OverflowError),
+        # то сумма остается согласованной с массивом
+        old = self.arr[self._index]
         self.arr[self._index] = value
+        self._sum += value - old
         if self._index < self._max - 1:
             self._index += 1
         else:
@@ -35,4 +45,159 @@ class Averager:
         if self._cnt < self._max:
             self._cnt += 1
 
-        return sum(self.arr) // self._cnt
+        return self._sum // self._cnt
+
+
+class _VectorFilter:
+    """Общая часть фильтров для нескольких каналов. Результат последнего вызова put хранится в self.value."""
+    def __init__(self, channels: int):
+        if channels < 1:
+            raise ValueError(f"Invalid channels value: {channels}")
+        self.channels = channels
+        self.value = array.array("i", (0 for _ in range(channels)))
+
+    def put(self, sample, offset: int = 0):
+        """Принимает значения всех каналов sample[offset], sample[offset + 1], ... и возвращает self.value.
+        Для переопределения программистом!!!"""
+        raise NotImplementedError
+
+    def process_into(self, samples, out, count: int = 0) -> int:
+        """Пропускает через фильтр count кадров из массива samples (каналы чередуются: x0, y0, z0, x1, ...)
+        и записывает результаты в out в том же порядке. Если count равен 0, то обрабатывается весь samples.
+        out может быть тем же массивом, что и samples. Возвращает количество обработанных кадров."""
+        ch = self.channels
+        if count <= 0:
+            count = len(samples) // ch
+        value = self.value
+        for index in range(0, ch * count, ch):
+            self.put(samples, index)
+            for i in range(ch):
+                out[index + i] = value[i]
+        return count
+
+
+class VectorAverager(_VectorFilter):
+    """Скользящее среднее по items_count последним значениям для channels каналов одновременно.
+    Сумма окна обновляется при каждом put, поэтому время обработки не зависит от длины окна.
+    Moving average over the last items_count values for channels at once, O(1) per put."""
+    def __init__(self, items_count: int = 8, channels: int = 3):
+        super().__init__(channels)
+        if items_count < 1:
+            raise ValueError(f"Invalid items_count value: {items_count}")
+        self._max = items_count
+        self._index = 0     # индекс начала самого старого кадра в arr
+        self._cnt = 0
+        self._sums = [0 for _ in range(channels)]
+        self.arr = array.array("i", (0 for _ in range(items_count * channels)))
+
+    @micropython.native
+    def put(self, sample, offset: int = 0):
+        ch = self.channels
+        arr = self.arr
+        sums = self._sums
+        value = self.value
+        index = self._index
+        cnt = self._cnt
+        if cnt < self._max:
+            cnt += 1
+        for i in range(ch):
+            v = sample[offset + i]
+            old = arr[index + i]
+            arr[index + i] = v  # до изменения суммы: при OverflowError сумма остается согласованной с arr
+            sums[i] += v - old
+            value[i] = sums[i] // cnt
+        self._cnt = cnt
+        index += ch
+        self._index = 0 if index >= len(arr) else index
+        return value
+
+
+class EmaFilter(_VectorFilter):
+    """Экспоненциальное скользящее среднее с коэффициентом alpha = 1 / 2**shift в целых числах (без FPU):
+    acc += x - acc / 2**shift; y = acc / 2**shift. Чем больше shift, тем сильнее сглаживание.
+    Exponential moving average with alpha = 1 / 2**shift in integer arithmetic."""
+    def __init__(self, shift: int = 3, channels: int = 3):
+        super().__init__(channels)
+        if shift not in range(16):
+            raise ValueError(f"Invalid shift value: {shift}")
+        self.shift = shift
+        self._acc = [0 for _ in range(channels)]
+        self._started = False
+
+    @micropython.native
+    def put(self, sample, offset: int = 0):
+        shift = self.shift
+        acc = self._acc
+        value = self.value
+        if not self._started:
+            for i in range(self.channels):
+                acc[i] = sample[offset + i] << shift    # первое значение - начальное состояние фильтра
+            self._started = True
+        for i in range(self.channels):
+            a = acc[i] + sample[offset + i] - (acc[i] >> shift)
+            acc[i] = a
+            value[i] = a >> shift
+        return value
+
+
+class MedianFilter(_VectorFilter):
+    """Скользящая медиана по items_count последним значениям для channels каналов одновременно.
+    Для каждого канала хранится окно значений и его отсортированная копия, которая обновляется вставкой
+    и удалением одного значения (двоичный поиск), без сортировки всего окна и без размещения объектов в куче.
+    Running median over the last items_count values for channels at once, with fixed memory."""
+    def __init__(self, items_count: int = 5, channels: int = 3):
+        super().__init__(channels)
+        if items_count < 1:
+            raise ValueError(f"Invalid items_count value: {items_count}")
+        self._max = items_count
+        self._index = 0
+        self._cnt = 0
+        self.arr = array.array("i", (0 for _ in range(items_count * channels)))
+        # отсортированные окна каналов, подряд: канал 0, канал 1, ...
+        self._sorted = array.array("i", (0 for _ in range(items_count * channels)))
+
+    @staticmethod
+    @micropython.native
+    def _find(data, start: int, count: int, value: int) -> int:
+        """Индекс первого элемента data[start:start + count], не меньшего value (двоичный поиск)"""
+        lo = start
+        hi = start + count
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if data[mid] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @micropython.native
+    def put(self, sample, offset: int = 0):
+        n = self._max
+        arr = self.arr
+        srt = self._sorted
+        value = self.value
+        index = self._index
+        full = self._cnt == n
+        cnt = self._cnt if full else self._cnt + 1
+        for ch in range(self.channels):
+            start = ch * n
+            v = sample[offset + ch]
+            size = cnt - 1  # количество значений в отсортированном окне после удаления старого
+            if full:
+                # удаление самого старого значения канала
+                pos = MedianFilter._find(srt, start, n, arr[start + index])
+                for j in range(pos, start + n - 1):
+                    srt[j] = srt[j + 1]
+            # вставка нового значения
+            pos = MedianFilter._find(srt, start, size, v)
+            j = start + size
+            while j > pos:
+                srt[j] = srt[j - 1]
+                j -= 1
+            srt[pos] = v
+            arr[start + index] = v
+            value[ch] = srt[start + cnt // 2]
+        self._cnt = cnt
+        index += 1
+        self._index = 0 if index == n else index
+        return value
@@ -1,12 +1,8 @@
 # micropython
 # MIT license
 # Copyright (c) 2022 Roman Shevchik   goctaprog@gmail.com
-import struct
-
-import micropython
-import ustruct
+from sensor_pack.compat import micropython, ustruct, SPI
 from sensor_pack import bus_service
-from machine import SPI
 
 
 @micropython.native
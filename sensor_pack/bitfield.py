@@ -1,6 +1,6 @@
 """MIT License
 Copyright (c) 2022 Roman Shevchik"""
-import micropython
+from sensor_pack.compat import micropython
 
 
 @micropython.native
@@ -8,10 +8,7 @@ def _bitmask(start: int, stop: int) -> int:
     """возвращает битовую маску по занимаемым битам.
     start - номер младшего бита маски (0..31).
     stop - номер старшего бита маски (0..31)."""
-    res = 0
-    for i in range(start, 1 + stop):
-        res |= 1 << i
-    return res
+    return ((1 << (1 + stop - start)) - 1) << start
 
 
 def check(start: int, stop: int):
@@ -57,6 +54,6 @@ def put(start: int, stop: int, source: int, value: int) -> int:
     Writes value to source's bit range"""
     check(start, stop)
     bitmask = _bitmask(start, stop)     # вычисление маски
-    src = source & bitmask              # чистка битового диапазона
+    src = source & ~bitmask             # чистка битового диапазона
     src |= (value << start) & bitmask   # установка битов в заданном диапазоне
     return src
@@ -3,7 +3,9 @@
 # Copyright (c) 2022 Roman Shevchik   goctaprog@gmail.com
 """MicroPython модуль для работы с шинами ввода/вывода"""
 
-from machine import I2C, SPI, Pin
+import array
+from sensor_pack import compat
+from sensor_pack.compat import I2C, SPI, Pin
 
 
 class BusAdapter:
@@ -112,13 +114,57 @@ class SpiAdapter(BusAdapter):
         # флаг для методов write.. . Если Истина, то data_mode (Pin) будет установлена в Истина, иначе в Ложь!
         # flag for write.. methods. If True, then data_mode (Pin) will be set to True, otherwise to False!
         self.data_packet = False
+        # флаг чтения, объединяемый с адресом регистра в первом байте посылки (RM3100 и многие другие датчики).
+        # read flag combined with the register address in the first byte of the packet.
+        self.read_flag = 0x80
+        self._addr_buf = bytearray(1)   # первый байт посылки (адрес регистра)
 
     def read_register(self, device_addr: Pin, reg_addr: int, bytes_count: int) -> bytes:
-        raise NotImplementedError
+        """считывает из регистра датчика значение за одну посылку (chip select).
+        device_addr - вывод MCU, подключенный к выводу выбора кристалла (CS) датчика.
+        Первый байт посылки - адрес регистра, объединенный с read_flag.
+        reads a value from the sensor register in one packet (chip select)."""
+        wr_buf = bytearray(1 + bytes_count)
+        wr_buf[0] = reg_addr | self.read_flag
+        rd_buf = bytearray(1 + bytes_count)
+        self.write_and_read(device_addr, wr_buf, rd_buf)
+        return bytes(rd_buf[1:])
 
     def write_register(self, device_addr: Pin, reg_addr: int, value: [int, bytes, bytearray],
                        bytes_count: int, byte_order: str):
-        raise NotImplementedError
+        """записывает данные value в датчик, по адресу reg_addr, за одну посылку (chip select).
+        bytes_count - кол-во записываемых данных
+        value - должно быть типов int, bytes, bytearray"""
+        buf = value
+        if isinstance(value, int):
+            buf = value.to_bytes(bytes_count, byte_order)
+        return self.write_buf_to_mem(device_addr, reg_addr, buf)
+
+    def read_buf_from_mem(self, device_addr: Pin, mem_addr: int, buf):
+        """Читает из устройства в буфер buf, начиная с адреса в устройстве mem_addr, за одну посылку
+        (chip select). Количество считываемых байт определяется длинной буфера buf.
+        Не размещает объектов в куче.
+        Reads from the device into buf, starting at mem_addr, in one packet. No heap allocation."""
+        addr_buf = self._addr_buf
+        addr_buf[0] = mem_addr | self.read_flag
+        try:
+            device_addr.low()   # chip select
+            self.bus.write(addr_buf)
+            self.bus.readinto(buf, 0x00)
+        finally:
+            device_addr.high()
+
+    def write_buf_to_mem(self, device_addr: Pin, mem_addr: int, buf):
+        """Записывает в устройство все байты из буфера buf, начиная с адреса в устройстве mem_addr,
+        за одну посылку (chip select)."""
+        addr_buf = self._addr_buf
+        addr_buf[0] = mem_addr & ~self.read_flag & 0xFF
+        try:
+            device_addr.low()   # chip select
+            self.bus.write(addr_buf)
+            self.bus.write(buf)
+        finally:
+            device_addr.high()
 
     def read(self, device_addr: Pin, n_bytes: int) -> bytes:
         """Read a number of bytes specified by n_bytes while continuously writing the single byte given by write.
@@ -166,3 +212,145 @@ class SpiAdapter(BusAdapter):
             return self.bus.write_readinto(wr_buf, rd_buf)
         finally:
             device_addr.high()
+
+
+if compat.is_micropython:
+    def _new_counters(size: int):
+        """Массив счетчиков без выделения памяти при обновлении. Запись в array("I") отбрасывает старшие
+        разряды, поэтому при переполнении счетчик начинается с нуля (по модулю 2**32)"""
+        return array.array("I", (0 for _ in range(size)))
+else:
+    def _new_counters(size: int):
+        """Список счетчиков: в CPython запись в array("I") значения 2**32 и больше вызывает OverflowError,
+        а целые числа Python не переполняются"""
+        return [0] * size
+
+
+class InstrumentedAdapter(BusAdapter):
+    """Адаптер-обертка для измерения нагрузки на шину. Передает все вызовы адаптеру adapter и учитывает для каждого
+    адреса регистра количество транзакций, считанных и записанных байт и суммарное время (мкс), а длительность
+    каждого вызова - в гистограмме с фиксированными интервалами: интервал i содержит длительности
+    от 2**(i - 1) до 2**i - 1 мкс (интервал 0 - меньше 1 мкс), последний интервал - все длительности больше.
+    Вызовы read и write (без адреса регистра) учитываются под адресом NO_REG.
+    Включается заменой адаптера датчика: sensor.adapter = InstrumentedAdapter(sensor.adapter). Если обертка
+    не используется, то затрат нет, при enabled = Ложь - одна проверка на вызов.
+    clock - источник времени с методами ticks_us() и ticks_diff() (например, rm3100sim.VirtualClock) или None
+    (sensor_pack.compat в момент создания обертки: ticks_us на MicroPython, perf_counter_ns на CPython
+    или часы, заданные compat.set_clock).
+
+    Bus adapter wrapper that counts transactions, bytes and time per register address and records
+    call latencies in a fixed-bucket histogram."""
+    NO_REG = 256
+    BUCKETS = 16
+
+    def __init__(self, adapter: BusAdapter, clock=None):
+        super().__init__(adapter.bus)
+        self.adapter = adapter
+        self.enabled = True
+        self._ticks_us = compat.ticks_us if clock is None else clock.ticks_us
+        self._ticks_diff = compat.ticks_diff if clock is None else clock.ticks_diff
+        # учет не должен прерывать обмен по шине исключением: счетчики не переполняются (CPython)
+        # или начинаются с нуля (MicroPython), смотри _new_counters
+        size = 1 + InstrumentedAdapter.NO_REG
+        self.transactions = _new_counters(size)
+        self.bytes_read = _new_counters(size)
+        self.bytes_written = _new_counters(size)
+        self.time_us = _new_counters(size)
+        self.histogram = _new_counters(InstrumentedAdapter.BUCKETS)
+
+    def __getattr__(self, name):
+        # остальные атрибуты (например, read_flag SpiAdapter) берутся у оборачиваемого адаптера
+        return getattr(self.adapter, name)
+
+    def reset(self):
+        """Обнуляет счетчики и гистограмму"""
+        for arr in (self.transactions, self.bytes_read, self.bytes_written, self.time_us, self.histogram):
+            for i in range(len(arr)):
+                arr[i] = 0
+
+    def _account(self, reg_addr: int, start: int, n_read: int, n_written: int):
+        elapsed = self._ticks_diff(self._ticks_us(), start)
+        index = reg_addr & 0xFF if reg_addr >= 0 else InstrumentedAdapter.NO_REG
+        self.transactions[index] += 1
+        self.bytes_read[index] += n_read
+        self.bytes_written[index] += n_written
+        self.time_us[index] += elapsed
+        bucket = 0
+        last = InstrumentedAdapter.BUCKETS - 1
+        while elapsed > 0 and bucket < last:
+            elapsed >>= 1
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def read_register(self, device_addr: [int, Pin], reg_addr: int, bytes_count: int) -> bytes:
+        if not self.enabled:
+            return self.adapter.read_register(device_addr, reg_addr, bytes_count)
+        start = self._ticks_us()
+        result = self.adapter.read_register(device_addr, reg_addr, bytes_count)
+        self._account(reg_addr, start, bytes_count, 0)
+        return result
+
+    def write_register(self, device_addr: [int, Pin], reg_addr: int, value: [int, bytes, bytearray],
+                       bytes_count: int, byte_order: str):
+        if not self.enabled:
+            return self.adapter.write_register(device_addr, reg_addr, value, bytes_count, byte_order)
+        start = self._ticks_us()
+        result = self.adapter.write_register(device_addr, reg_addr, value, bytes_count, byte_order)
+        self._account(reg_addr, start, 0, bytes_count if isinstance(value, int) else len(value))
+        return result
+
+    def read_buf_from_mem(self, device_addr: [int, Pin], mem_addr: int, buf):
+        if not self.enabled:
+            return self.adapter.read_buf_from_mem(device_addr, mem_addr, buf)
+        start = self._ticks_us()
+        result = self.adapter.read_buf_from_mem(device_addr, mem_addr, buf)
+        self._account(mem_addr, start, len(buf), 0)
+        return result
+
+    def write_buf_to_mem(self, device_addr: [int, Pin], mem_addr: int, buf):
+        if not self.enabled:
+            return self.adapter.write_buf_to_mem(device_addr, mem_addr, buf)
+        start = self._ticks_us()
+        result = self.adapter.write_buf_to_mem(device_addr, mem_addr, buf)
+        self._account(mem_addr, start, 0, len(buf))
+        return result
+
+    def read(self, device_addr: [int, Pin], n_bytes: int) -> bytes:
+        if not self.enabled:
+            return self.adapter.read(device_addr, n_bytes)
+        start = self._ticks_us()
+        result = self.adapter.read(device_addr, n_bytes)
+        self._account(-1, start, n_bytes, 0)
+        return result
+
+    def write(self, device_addr: [int, Pin], buf: bytes):
+        if not self.enabled:
+            return self.adapter.write(device_addr, buf)
+        start = self._ticks_us()
+        result = self.adapter.write(device_addr, buf)
+        self._account(-1, start, 0, len(buf))
+        return result
+
+    def get_stats(self) -> list:
+        """Возвращает список кортежей (адрес регистра, транзакций, считано байт, записано байт, время мкс)
+        для адресов, к которым были обращения, в порядке убывания времени."""
+        result = [(addr, self.transactions[addr], self.bytes_read[addr], self.bytes_written[addr], self.time_us[addr])
+                  for addr in range(len(self.transactions)) if self.transactions[addr]]
+        result.sort(key=lambda item: item[4], reverse=True)
+        return result
+
+    def dump(self, names: dict = None):
+        """Выводит статистику по регистрам и гистограмму длительностей вызовов.
+        names - словарь {адрес регистра: имя} для удобства чтения (необязательно)."""
+        print("reg\ttrans\tread\twritten\ttime_us")
+        for addr, trans, n_read, n_written, t in self.get_stats():
+            name = "-" if InstrumentedAdapter.NO_REG == addr else f"0x{addr:02x}"
+            if names and addr in names:
+                name = names[addr]
+            print(f"{name}\t{trans}\t{n_read}\t{n_written}\t{t}")
+        print("latency_us\tcalls")
+        for bucket, count in enumerate(self.histogram):
+            if count:
+                low = 0 if 0 == bucket else 1 << (bucket - 1)
+                high = "..." if InstrumentedAdapter.BUCKETS - 1 == bucket else (1 << bucket) - 1
+                print(f"{low}-{high}\t{count}")
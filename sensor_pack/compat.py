@@ -0,0 +1,102 @@
+# micropython
+# MIT license
+# Copyright (c) 2022 Roman Shevchik   goctaprog@gmail.com
+"""Совместимость с CPython. Позволяет импортировать модули пакета вне MicroPython, например, для проверки
+драйверов на ПК вместе с имитатором шины.
+На MicroPython все имена берутся из встроенных модулей, без посредников и без накладных расходов.
+
+Compatibility with CPython. Allows package modules to be imported outside MicroPython,
+for example, to check drivers on a PC with a bus simulator."""
+import sys
+
+# Истина, если код исполняется MicroPython
+is_micropython = "micropython" == sys.implementation.name
+
+try:
+    import micropython
+except ImportError:
+    class micropython:
+        """Заменитель модуля micropython для CPython. Декораторы эмиттеров кода ничего не делают."""
+        @staticmethod
+        def native(func):
+            return func
+
+        @staticmethod
+        def viper(func):
+            return func
+
+        @staticmethod
+        def const(value):
+            return value
+
+        @staticmethod
+        def schedule(func, arg) -> bool:
+            """В CPython нет жестких прерываний, поэтому функция вызывается сразу"""
+            func(arg)
+            return True
+
+        @staticmethod
+        def alloc_emergency_exception_buf(size: int):
+            pass
+
+try:
+    import ustruct
+except ImportError:
+    import struct as ustruct
+
+try:
+    from machine import I2C, SPI, Pin
+except ImportError:
+    # вне MicroPython эти имена используются только в аннотациях
+    I2C = SPI = Pin = None
+
+try:
+    from time import ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_us, sleep_ms
+except ImportError:
+    from time import perf_counter_ns, sleep
+
+    # как в большинстве портов MicroPython: значения ticks_xx() имеют период 2**30
+    _TICKS_PERIOD = 1 << 30
+    _TICKS_MAX = _TICKS_PERIOD - 1
+    _TICKS_HALF = _TICKS_PERIOD // 2
+
+    def ticks_us() -> int:
+        return (perf_counter_ns() // 1_000) & _TICKS_MAX
+
+    def ticks_ms() -> int:
+        return (perf_counter_ns() // 1_000_000) & _TICKS_MAX
+
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        """Разность ticks1 - ticks2 с учетом переполнения счетчика"""
+        return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+    def ticks_add(ticks: int, delta: int) -> int:
+        return (ticks + delta) & _TICKS_MAX
+
+    def sleep_us(us: int):
+        sleep(us / 1_000_000)
+
+    def sleep_ms(ms: int):
+        sleep(ms / 1_000)
+
+# источник времени по умолчанию (встроенный), смотри set_clock
+_builtin_clock = ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_us, sleep_ms
+# виртуальные часы, заданные set_clock, или None
+clock = None
+
+
+def set_clock(source=None):
+    """Заменяет источник времени пакета: ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_us, sleep_ms
+    берутся у source (например, rm3100sim.VirtualClock), None - возврат к встроенным функциям.
+    Драйверы обращаются к этим функциям через модуль (compat.ticks_us()), поэтому замена действует сразу.
+    Нужна для проверки драйверов вместе с имитатором шины: ожидание измерения сдвигает виртуальное время,
+    а не реальное.
+
+    Replaces the package time source (e.g. with a simulator's virtual clock). None restores the built-ins."""
+    global clock, ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_us, sleep_ms
+    clock = source
+    if source is None:
+        ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_us, sleep_ms = _builtin_clock
+        return
+    ticks_us, ticks_ms, ticks_diff = source.ticks_us, source.ticks_ms, source.ticks_diff
+    ticks_add, sleep_us, sleep_ms = source.ticks_add, source.sleep_us, source.sleep_ms
@@ -1,8 +1,41 @@
 """Преобразование значений из одной единицы измерения в другую.
 Converting values from one unit of measure to another"""
+from sensor_pack.compat import micropython
 
 
 def pa_mmhg(value: float) -> float:
     """Перевод атмосферного давления из Па в мм рт.ст.
     Convert air pressure from Pa to mm Hg."""
     return 7.50062E-3 * value
+
+
+def get_fixed_scale(units_per_lsb: float, shift: int = 10) -> int:
+    """Возвращает множитель в формате с фиксированной точкой (shift дробных бит) для перевода отсчетов АЦП
+    в единицы измерения функциями scale_fixed и scale_fixed_into. Вычисляется один раз, при настройке.
+    Returns a fixed-point multiplier (shift fractional bits) for converting ADC counts to units."""
+    return int(units_per_lsb * (1 << shift) + 0.5)
+
+
+@micropython.native
+def scale_fixed(raw: int, scale: int, shift: int = 10) -> int:
+    """Переводит raw (отсчеты АЦП) в единицы измерения с округлением, только целочисленной арифметикой
+    (для MCU без FPU). scale - множитель из get_fixed_scale с тем же shift.
+    Converts raw counts to units with rounding using integer arithmetic only."""
+    return (raw * scale + (1 << (shift - 1))) >> shift
+
+
+@micropython.native
+def scale_fixed_into(samples, out, scales, shift: int = 10, count: int = 0) -> int:
+    """Переводит count кадров массива samples (каналы чередуются: x0, y0, z0, x1, ...) в единицы измерения
+    и записывает в out (может быть тем же массивом). scales - множители каналов (get_fixed_scale), их количество
+    равно количеству каналов. Если count равен 0, то обрабатывается весь samples.
+    Возвращает количество обработанных кадров.
+    Batch version of scale_fixed for interleaved multi-channel arrays."""
+    ch = len(scales)
+    if count <= 0:
+        count = len(samples) // ch
+    rnd = 1 << (shift - 1)
+    for index in range(0, ch * count, ch):
+        for i in range(ch):
+            out[index + i] = (samples[index + i] * scales[i] + rnd) >> shift
+    return count
@@ -14,10 +14,20 @@ Copyright (c) 2022 Roman Shevchik
     Входная последовательность: 0x01 0x02 0x03
     CRC-8: 0x87
     Входная последовательность: 0 1 2 3 4 5 6 7 8 9
-    CRC-8: 0x52"""
+    CRC-8: 0x52
 
+ Вычисление по таблице на 256 значений (одна таблица на полином, вычисляется при первом обращении),
+ на MicroPython - ядром viper. Для потока данных - класс Crc8 с методом update.
+ Table-driven computation (one cached 256-entry table per polynomial), viper kernel on MicroPython.
+ Use the Crc8 class with its update method for streams."""
+from sensor_pack.compat import micropython, is_micropython
 
-def crc8(sequence, polynomial: int, init_value: int = 0x00):
+# таблицы CRC {полином: bytes(256)}
+_tables = dict()
+
+
+def _crc8_bitwise(sequence, polynomial: int, init_value: int = 0x00) -> int:
+    """Побитовое вычисление CRC-8 (8 итераций на байт). Используется для построения таблиц."""
     mask = 0xFF
     crc = init_value & mask
     for item in sequence:
@@ -28,3 +38,74 @@ def crc8(sequence, polynomial: int, init_value: int = 0x00):
             else:
                 crc = mask & (crc << 1)
     return crc
+
+
+def get_table(polynomial: int) -> bytes:
+    """Возвращает таблицу CRC-8 (256 байт) для полинома polynomial. Таблица вычисляется один раз."""
+    polynomial &= 0xFF
+    table = _tables.get(polynomial)
+    if table is None:
+        table = bytes(_crc8_bitwise((i,), polynomial) for i in range(256))
+        _tables[polynomial] = table
+    return table
+
+
+if is_micropython:
+    @micropython.viper
+    def _update(table, crc: int, buf, start: int, count: int) -> int:
+        """Продолжает вычисление CRC crc по байтам buf[start:start + count]"""
+        tab = ptr8(table)
+        src = ptr8(buf)
+        i = start
+        end = start + count
+        while i < end:
+            crc = tab[(crc ^ src[i]) & 0xFF]
+            i += 1
+        return crc
+else:
+    def _update(table, crc: int, buf, start: int, count: int) -> int:
+        """Продолжает вычисление CRC crc по байтам buf[start:start + count]"""
+        for i in range(start, start + count):
+            crc = table[crc ^ buf[i]]
+        return crc
+
+
+def crc8(sequence, polynomial: int, init_value: int = 0x00) -> int:
+    """Возвращает CRC-8 последовательности байт sequence (bytes, bytearray, memoryview или
+    последовательность целых)."""
+    table = get_table(polynomial)
+    crc = init_value & 0xFF
+    if isinstance(sequence, (bytes, bytearray, memoryview)):
+        return _update(table, crc, sequence, 0, len(sequence))
+    for item in sequence:
+        crc = table[crc ^ (item & 0xFF)]
+    return crc
+
+
+class Crc8:
+    """Потоковое вычисление CRC-8: данные передаются частями методом update.
+    Streaming CRC-8: feed the data in chunks with the update method.
+        crc = Crc8(0x31, 0xFF)
+        crc.update(header)
+        crc.update(record)
+        value = crc.get()"""
+    def __init__(self, polynomial: int = 0x31, init_value: int = 0xFF):
+        self._table = get_table(polynomial)
+        self._init = init_value & 0xFF
+        self._crc = self._init
+
+    def reset(self):
+        """Начинает вычисление заново"""
+        self._crc = self._init
+
+    def update(self, buf, start: int = 0, count: int = -1) -> int:
+        """Продолжает вычисление по байтам buf[start:start + count] (count < 0 - до конца buf).
+        buf - bytes, bytearray или memoryview. Не размещает объектов в куче. Возвращает текущее значение CRC."""
+        if count < 0:
+            count = len(buf) - start
+        self._crc = _update(self._table, self._crc, buf, start, count)
+        return self._crc
+
+    def get(self) -> int:
+        """Возвращает текущее значение CRC"""
+        return self._crc
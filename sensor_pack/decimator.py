@@ -0,0 +1,253 @@
+"""
+MIT License
+Copyright (c) 2022 Roman Shevchik
+
+Децимация (понижение частоты дискретизации) многоканальных потоков, например X, Y, Z магнитометра,
+измеряющего с частотой 300..600 Гц, до 10..50 Гц без потери выигрыша в шуме от высокой частоты измерений.
+    CicDecimator - фильтр CIC (каскад интеграторов и гребенчатых фильтров), только сложения;
+    FirDecimator - КИХ фильтр нижних частот, вычисляемый только в моменты выходных отсчетов (полифазная схема).
+На MCU - целые числа (process_into, массивы с чередующимися каналами x0, y0, z0, x1, ...), на CPython с NumPy -
+векторные вычисления над блоком формы (N, channels) (process_block). Результаты обоих путей совпадают.
+
+Decimation of multichannel streams (CIC and polyphase FIR). Integer arithmetic on the MCU (process_into),
+vectorized NumPy on CPython (process_block), both give identical results."""
+import array
+import math
+from sensor_pack.compat import micropython
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# разрядность модульной арифметики интеграторов CIC: значения остаются в пределах short int MicroPython
+_WRAP_BITS = 30
+_WRAP_MASK = (1 << _WRAP_BITS) - 1
+_WRAP_HALF = 1 << (_WRAP_BITS - 1)
+
+
+def _check_numpy():
+    if numpy is None:
+        raise ImportError("NumPy is required for block processing!")
+
+
+class _Decimator:
+    """Общая часть дециматоров: factor - коэффициент децимации, channels - количество каналов."""
+    def __init__(self, factor: int, channels: int):
+        if factor < 1:
+            raise ValueError(f"Invalid factor value: {factor}")
+        if channels < 1:
+            raise ValueError(f"Invalid channels value: {channels}")
+        self.factor = factor
+        self.channels = channels
+        self._phase = 0     # количество входных кадров после последнего выходного
+
+    def get_out_count(self, count: int) -> int:
+        """Возвращает количество выходных кадров для count следующих входных кадров"""
+        return (self._phase + count) // self.factor
+
+    def process_into(self, samples, out, count: int = 0) -> int:
+        """Пропускает через дециматор count кадров из массива samples (каналы чередуются: x0, y0, z0, x1, ...)
+        и записывает выходные кадры в out (в том же порядке, не менее get_out_count(count) кадров).
+        Если count равен 0, то обрабатывается весь samples. Возвращает количество выходных кадров.
+        Для переопределения программистом!!!"""
+        raise NotImplementedError
+
+    def process_block(self, data):
+        """Обрабатывает блок numpy.ndarray формы (N, channels) и возвращает выходные кадры (M, channels), int64.
+        Только для CPython с установленным NumPy! Для переопределения программистом!!!"""
+        raise NotImplementedError
+
+
+class CicDecimator(_Decimator):
+    """CIC дециматор порядка order (order интеграторов на входной частоте, order гребенчатых фильтров с задержкой 1
+    на выходной частоте). Коэффициент усиления factor**order компенсируется на выходе (сдвигом, если factor -
+    степень двойки). Интеграторы работают в модульной арифметике (_WRAP_BITS бит), поэтому их переполнение не
+    искажает результат, если input_bits + order * log2(factor) <= _WRAP_BITS (проверяется в конструкторе).
+    input_bits - разрядность входных значений со знаком (18 бит - весь диапазон RM3100 при CCR до 400).
+
+    CIC decimator of the given order. Integrators use modular arithmetic, so their overflow is harmless."""
+    def __init__(self, factor: int, order: int = 3, channels: int = 3, input_bits: int = 18):
+        super().__init__(factor, channels)
+        if order < 1:
+            raise ValueError(f"Invalid order value: {order}")
+        growth = math.ceil(order * math.log(factor) / math.log(2)) if factor > 1 else 0
+        if input_bits + growth > _WRAP_BITS:
+            raise ValueError(f"Too large factor/order for {input_bits} bit input: {factor}, {order}")
+        self.order = order
+        self.gain = factor ** order
+        # сдвиг вместо деления, если коэффициент усиления - степень двойки
+        self._shift = growth if 1 << growth == self.gain else -1
+        self._integrators = array.array("i", (0 for _ in range(order * channels)))
+        self._combs = array.array("i", (0 for _ in range(order * channels)))
+
+    @micropython.native
+    def _scale(self, value: int) -> int:
+        if self._shift >= 0:
+            return (value + ((1 << self._shift) >> 1)) >> self._shift
+        return (value + (self.gain >> 1)) // self.gain
+
+    @micropython.native
+    def process_into(self, samples, out, count: int = 0) -> int:
+        ch = self.channels
+        order = self.order
+        factor = self.factor
+        if count <= 0:
+            count = len(samples) // ch
+        integ = self._integrators
+        combs = self._combs
+        phase = self._phase
+        out_index = 0
+        for index in range(0, ch * count, ch):
+            for c in range(ch):
+                v = samples[index + c]
+                base = c * order
+                for k in range(base, base + order):
+                    v = (integ[k] + v) & _WRAP_MASK
+                    integ[k] = v
+            phase += 1
+            if phase < factor:
+                continue
+            phase = 0
+            for c in range(ch):
+                v = integ[c * order + order - 1]
+                base = c * order
+                for k in range(base, base + order):
+                    prev = combs[k]
+                    combs[k] = v
+                    v = (v - prev) & _WRAP_MASK
+                if v >= _WRAP_HALF:
+                    v -= 1 << _WRAP_BITS
+                out[out_index + c] = self._scale(v)
+            out_index += ch
+        self._phase = phase
+        return out_index // ch
+
+    def process_block(self, data):
+        _check_numpy()
+        x = numpy.asarray(data, dtype=numpy.int64).reshape(-1, self.channels)
+        order = self.order
+        integ = numpy.frombuffer(self._integrators, dtype=numpy.int32).reshape(self.channels, order)
+        combs = numpy.frombuffer(self._combs, dtype=numpy.int32).reshape(self.channels, order)
+        # интеграторы: накопленные суммы с начальным состоянием, в той же модульной арифметике
+        v = x
+        last = numpy.empty((self.channels, order), dtype=numpy.int64)
+        for k in range(order):
+            v = (numpy.cumsum(v, axis=0) + integ[:, k]) & _WRAP_MASK
+            last[:, k] = v[-1] if len(v) else integ[:, k]
+        # выходные отсчеты - каждый factor-й входной кадр с учетом фазы
+        first = self.factor - 1 - self._phase
+        v = v[first::self.factor]
+        self._phase = (self._phase + len(x)) % self.factor
+        integ[:] = last
+        for k in range(order):
+            prev = numpy.concatenate((combs[:, k][numpy.newaxis, :], v[:-1]), axis=0) if len(v) else v
+            new_state = v[-1] if len(v) else combs[:, k]
+            v = (v - prev) & _WRAP_MASK
+            combs[:, k] = new_state
+        v = numpy.where(v >= _WRAP_HALF, v - (1 << _WRAP_BITS), v)
+        if self._shift >= 0:
+            return (v + ((1 << self._shift) >> 1)) >> self._shift
+        return (v + (self.gain >> 1)) // self.gain
+
+
+def design_lowpass(taps: int, factor: int, shift: int = 10) -> array.array:
+    """Возвращает коэффициенты КИХ фильтра нижних частот (оконный метод, окно Хэмминга) для децимации
+    в factor раз: частота среза - половина выходной частоты Найквиста. Коэффициенты в формате с фиксированной
+    точкой (shift дробных бит), их сумма равна 2**shift (единичное усиление на нулевой частоте)."""
+    if taps < 1:
+        raise ValueError(f"Invalid taps value: {taps}")
+    fc = 0.5 / factor   # частота среза относительно входной частоты дискретизации
+    mid = (taps - 1) / 2
+    h = []
+    for n in range(taps):
+        t = n - mid
+        sinc = 2 * fc if 0 == t else math.sin(2 * math.pi * fc * t) / (math.pi * t)
+        window = 0.54 - 0.46 * math.cos(2 * math.pi * n / (taps - 1)) if taps > 1 else 1.0
+        h.append(sinc * window)
+    total = sum(h)
+    scale = 1 << shift
+    coeffs = [int(round(scale * v / total)) for v in h]
+    coeffs[taps // 2] += scale - sum(coeffs)    # точная сумма после округления
+    return array.array("i", coeffs)
+
+
+class FirDecimator(_Decimator):
+    """КИХ дециматор: y[m] = sum(h[k] * x[m * factor - k]) / 2**shift. Свертка вычисляется только для выходных
+    кадров (полифазная схема), поэтому затраты в factor раз меньше, чем у фильтра с последующим прореживанием.
+    coeffs - коэффициенты с фиксированной точкой (смотри design_lowpass). На MCU произведение отсчета на
+    коэффициент и их сумма должны помещаться в short int MicroPython (input_bits + shift <= 28), иначе
+    вычисления верны, но размещают объекты в куче.
+
+    FIR decimator that computes the convolution only at output instants (polyphase form)."""
+    def __init__(self, coeffs, factor: int, channels: int = 3, shift: int = 10):
+        super().__init__(factor, channels)
+        if not len(coeffs):
+            raise ValueError("No coefficients!")
+        self.coeffs = array.array("i", coeffs)
+        self.shift = shift
+        # кольцевой буфер истории: последние len(coeffs) кадров
+        self._history = array.array("i", (0 for _ in range(len(coeffs) * channels)))
+        self._pos = 0   # индекс кадра, в который будет записан следующий входной кадр
+
+    @micropython.native
+    def process_into(self, samples, out, count: int = 0) -> int:
+        ch = self.channels
+        factor = self.factor
+        if count <= 0:
+            count = len(samples) // ch
+        coeffs = self.coeffs
+        taps = len(coeffs)
+        hist = self._history
+        shift = self.shift
+        rnd = (1 << shift) >> 1
+        pos = self._pos
+        phase = self._phase
+        out_index = 0
+        for index in range(0, ch * count, ch):
+            dst = pos * ch
+            for c in range(ch):
+                hist[dst + c] = samples[index + c]
+            newest = pos
+            pos += 1
+            if pos == taps:
+                pos = 0
+            phase += 1
+            if phase < factor:
+                continue
+            phase = 0
+            for c in range(ch):
+                acc = 0
+                j = newest
+                for k in range(taps):
+                    acc += coeffs[k] * hist[j * ch + c]
+                    j = taps - 1 if 0 == j else j - 1
+                out[out_index + c] = (acc + rnd) >> shift
+            out_index += ch
+        self._pos = pos
+        self._phase = phase
+        return out_index // ch
+
+    def process_block(self, data):
+        _check_numpy()
+        ch = self.channels
+        x = numpy.asarray(data, dtype=numpy.int64).reshape(-1, ch)
+        taps = len(self.coeffs)
+        # история в хронологическом порядке (самый старый кадр первый)
+        hist = numpy.frombuffer(self._history, dtype=numpy.int32).reshape(taps, ch)
+        ordered = numpy.roll(hist, -self._pos, axis=0).astype(numpy.int64)
+        full = numpy.concatenate((ordered, x), axis=0)
+        # индексы выходных кадров во входном блоке
+        first = self.factor - 1 - self._phase
+        idx = numpy.arange(first, len(x), self.factor) + taps     # индексы в full
+        h = numpy.asarray(self.coeffs, dtype=numpy.int64)
+        windows = numpy.lib.stride_tricks.sliding_window_view(full, taps, axis=0)  # (len(full) - taps + 1, ch, taps)
+        # окно, заканчивающееся кадром i, имеет индекс i - taps + 1; свертка - с обращенными коэффициентами
+        acc = windows[idx - taps + 1] @ h[::-1]
+        result = (acc + ((1 << self.shift) >> 1)) >> self.shift
+        # новое состояние: последние taps кадров
+        tail = full[-taps:].astype(numpy.int32)
+        hist[:] = tail
+        self._pos = 0
+        self._phase = (self._phase + len(x)) % self.factor
+        return result
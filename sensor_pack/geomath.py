@@ -0,0 +1,118 @@
+"""
+MIT License
+Copyright (c) 2022 Roman Shevchik
+
+Быстрые целочисленные вычисления для магнитометров: модуль вектора магнитного поля (целочисленный
+квадратный корень) и направление (atan2 по таблице с линейной интерполяцией, в сотых долях градуса).
+Для одного измерения и для массива измерений (x0, y0, z0, x1, y1, z1, ...). Без вычислений с плавающей точкой.
+
+Fast integer numerics for magnetometers: field magnitude (integer square root) and heading (table-driven atan2
+with linear interpolation, in hundredths of a degree). Scalar and array entry points, no floating point."""
+import math
+from sensor_pack.compat import micropython
+
+# atan(i / 64) в сотых долях градуса, i = 0..64
+_ATAN_TABLE = tuple(int(0.5 + 18000 * math.atan(i / 64) / math.pi) for i in range(65))
+
+# полный оборот, полуоборот и четверть оборота в сотых долях градуса
+FULL_TURN = 36000
+_HALF_TURN = 18000
+_QUARTER_TURN = 9000
+
+_isqrt = getattr(math, "isqrt", None)   # есть в CPython 3.8+, нет в MicroPython
+
+if _isqrt is not None:
+    def isqrt(n: int) -> int:
+        """Возвращает целую часть квадратного корня из n (n >= 0).
+        Returns the integer square root of n (n >= 0)."""
+        return _isqrt(n) if n > 0 else 0
+else:
+    @micropython.native
+    def isqrt(n: int) -> int:
+        """Возвращает целую часть квадратного корня из n (n >= 0). Поразрядный метод: только сдвиги и сложения.
+        Returns the integer square root of n (n >= 0). Digit-by-digit method: shifts and additions only."""
+        if n <= 0:
+            return 0
+        bit = 1 << 30
+        while bit <= n >> 2:
+            bit <<= 2
+        while bit > n:
+            bit >>= 2
+        res = 0
+        while bit:
+            tmp = res + bit
+            if n >= tmp:
+                n -= tmp
+                res = (res >> 1) + bit
+            else:
+                res >>= 1
+            bit >>= 2
+        return res
+
+
+def magnitude(x: int, y: int, z: int) -> int:
+    """Возвращает модуль вектора (x, y, z), округленный вниз до целого.
+    Returns the magnitude of the (x, y, z) vector, rounded down."""
+    return isqrt(x * x + y * y + z * z)
+
+
+@micropython.native
+def atan2(y: int, x: int) -> int:
+    """Возвращает угол между осью X и вектором (x, y) в сотых долях градуса, в диапазоне -18000..18000.
+    Погрешность не более 0.012 градуса. atan2(0, 0) возвращает 0.
+    Returns the angle of the (x, y) vector in hundredths of a degree, -18000..18000."""
+    ax = x if x >= 0 else -x
+    ay = y if y >= 0 else -y
+    if ax == ay:
+        if 0 == ax:
+            return 0
+        angle = 4500
+    else:
+        table = _ATAN_TABLE
+        if ay < ax:
+            r = (ay << 16) // ax   # отношение в формате Q16, 0..65535
+        else:
+            r = (ax << 16) // ay
+        index = r >> 10
+        frac = r & 0x3FF
+        a0 = table[index]
+        angle = a0 + (((table[index + 1] - a0) * frac + 512) >> 10)
+        if ay > ax:
+            angle = _QUARTER_TURN - angle
+    if x < 0:
+        angle = _HALF_TURN - angle
+    return -angle if y < 0 else angle
+
+
+def heading(x: int, y: int) -> int:
+    """Возвращает направление вектора (x, y) (угол от оси X к оси Y) в сотых долях градуса, в диапазоне 0..35999.
+    Датчик должен быть расположен горизонтально!
+    Returns the (x, y) vector heading in hundredths of a degree, 0..35999. The sensor must be level!"""
+    angle = atan2(y, x)
+    return angle + FULL_TURN if angle < 0 else angle
+
+
+def magnitude_into(samples, out, count: int = 0) -> int:
+    """Записывает в out[i] модуль i-го вектора массива samples (x0, y0, z0, x1, y1, z1, ...).
+    count - количество векторов (0 - весь массив). Возвращает количество векторов."""
+    if count <= 0:
+        count = len(samples) // 3
+    _isq = isqrt
+    for i in range(count):
+        j = 3 * i
+        x, y, z = samples[j], samples[j + 1], samples[j + 2]
+        out[i] = _isq(x * x + y * y + z * z)
+    return count
+
+
+def heading_into(samples, out, count: int = 0) -> int:
+    """Записывает в out[i] направление (смотри heading) i-го вектора массива samples (x0, y0, z0, x1, ...).
+    count - количество векторов (0 - весь массив). Возвращает количество векторов."""
+    if count <= 0:
+        count = len(samples) // 3
+    _atan2 = atan2
+    for i in range(count):
+        j = 3 * i
+        angle = _atan2(samples[j + 1], samples[j])
+        out[i] = angle + FULL_TURN if angle < 0 else angle
+    return count
@@ -0,0 +1,68 @@
+# micropython
+# MIT license
+# Copyright (c) 2022 Roman Shevchik   goctaprog@gmail.com
+"""Декодирование знаковых 24-х битных целых (big endian), например результатов измерений RM3100.
+На MicroPython используются ядра viper, на CPython - int.from_bytes, для обработки записанных блоков на ПК - NumPy.
+
+Decoding of signed 24-bit integers (big endian), for example RM3100 measurement results.
+MicroPython uses viper kernels, CPython uses int.from_bytes, NumPy is used for recorded blocks on a PC."""
+from sensor_pack.compat import micropython, is_micropython
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if is_micropython:
+    @micropython.viper
+    def decode(buf, offset: int) -> int:
+        """Возвращает знаковое 24-х битное значение из buf, начиная с байта offset.
+        Returns a signed 24-bit value from buf, starting at byte offset."""
+        src = ptr8(buf)
+        n = (src[offset] << 16) | (src[offset + 1] << 8) | src[offset + 2]
+        if n & 0x800000:
+            n -= 0x1000000
+        return n
+
+    @micropython.viper
+    def decode_into(buf, out, count: int, out_offset: int):
+        """Декодирует count значений из buf (3 * count байт) в массив out (array('i')),
+        начиная с элемента out_offset.
+        Decodes count values from buf into out (array('i')), starting at element out_offset."""
+        src = ptr8(buf)
+        dst = ptr32(out)
+        for i in range(count):
+            j = 3 * i
+            n = (src[j] << 16) | (src[j + 1] << 8) | src[j + 2]
+            if n & 0x800000:
+                n -= 0x1000000
+            dst[out_offset + i] = n
+else:
+    def decode(buf, offset: int) -> int:
+        """Возвращает знаковое 24-х битное значение из buf, начиная с байта offset.
+        Returns a signed 24-bit value from buf, starting at byte offset."""
+        return int.from_bytes(buf[offset:offset + 3], "big", signed=True)
+
+    def decode_into(buf, out, count: int, out_offset: int):
+        """Декодирует count значений из buf (3 * count байт) в массив out (array('i')),
+        начиная с элемента out_offset.
+        Decodes count values from buf into out (array('i')), starting at element out_offset."""
+        from_bytes = int.from_bytes
+        for i in range(count):
+            j = 3 * i
+            out[out_offset + i] = from_bytes(buf[j:j + 3], "big", signed=True)
+
+
+def decode_block(data, axes: int = 3):
+    """Декодирует блок из N записей по axes значений (N * 3 * axes байт) в numpy.ndarray формы (N, axes)
+    и типа int32 за один вызов. Только для CPython с установленным NumPy!
+    Decodes a block of N records of axes values (N * 3 * axes bytes) into an (N, axes) int32 numpy.ndarray."""
+    if numpy is None:
+        raise ImportError("NumPy is required for block decoding!")
+    raw = numpy.frombuffer(data, dtype=numpy.uint8)
+    if raw.size % (3 * axes):
+        raise ValueError(f"Invalid block length: {raw.size}")
+    b = raw.reshape(-1, 3).astype(numpy.int32)
+    n = (b[:, 0] << 16) | (b[:, 1] << 8) | b[:, 2]
+    n = (n ^ 0x800000) - 0x800000   # расширение знака
+    return n.reshape(-1, axes)
@@ -0,0 +1,230 @@
+"""
+MIT License
+Copyright (c) 2022 Roman Shevchik
+
+Адаптеры шин для Linux (CPython), например для шлюзов с RM3100, подключенным к /dev/i2c-N или /dev/spidevB.C,
+без сопроцессора с MicroPython.
+    LinuxI2cAdapter - i2c-dev, ioctl I2C_RDWR: запись адреса регистра и чтение данных одним вызовом ядра
+                      (комбинированная транзакция с повторным START), например 9 байт результата измерения;
+    LinuxSpiAdapter - spidev, ioctl SPI_IOC_MESSAGE: адрес регистра и данные в одной посылке (chip select).
+Функцию ioctl и файловый дескриптор можно подменить, например для проверки без оборудования
+или с модулем ядра i2c-stub.
+
+Пример:
+    with LinuxI2cAdapter(1) as adapter:
+        sensor = rm3100mod.RM3100(adapter, address=0x20)
+    # SPI: адрес устройства не используется
+    sensor = rm3100mod.RM3100(LinuxSpiAdapter(0, 0, baudrate=1_000_000), address=None)
+
+Bus adapters for Linux hosts (CPython): i2c-dev with the I2C_RDWR ioctl (one kernel call per combined
+write+read transaction) and spidev with SPI_IOC_MESSAGE. The ioctl function and the file descriptor can be
+replaced for testing."""
+import ctypes
+import os
+from sensor_pack.bus_service import I2cAdapter, SpiAdapter
+
+try:
+    from fcntl import ioctl as _ioctl
+except ImportError:
+    _ioctl = None
+
+# linux/i2c-dev.h, linux/i2c.h
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+
+
+class I2cMsg(ctypes.Structure):
+    """struct i2c_msg"""
+    _fields_ = [("addr", ctypes.c_uint16), ("flags", ctypes.c_uint16), ("len", ctypes.c_uint16),
+                ("buf", ctypes.POINTER(ctypes.c_uint8))]
+
+
+class I2cRdwrData(ctypes.Structure):
+    """struct i2c_rdwr_ioctl_data"""
+    _fields_ = [("msgs", ctypes.POINTER(I2cMsg)), ("nmsgs", ctypes.c_uint32)]
+
+
+# linux/spi/spidev.h
+class SpiIocTransfer(ctypes.Structure):
+    """struct spi_ioc_transfer"""
+    _fields_ = [("tx_buf", ctypes.c_uint64), ("rx_buf", ctypes.c_uint64), ("len", ctypes.c_uint32),
+                ("speed_hz", ctypes.c_uint32), ("delay_usecs", ctypes.c_uint16), ("bits_per_word", ctypes.c_uint8),
+                ("cs_change", ctypes.c_uint8), ("tx_nbits", ctypes.c_uint8), ("rx_nbits", ctypes.c_uint8),
+                ("word_delay_usecs", ctypes.c_uint8), ("pad", ctypes.c_uint8)]
+
+
+def _iow(nr: int, size: int) -> int:
+    """_IOW('k', nr, size) для spidev"""
+    return (1 << 30) | (size << 16) | (ord("k") << 8) | nr
+
+
+def spi_ioc_message(count: int) -> int:
+    """SPI_IOC_MESSAGE(count)"""
+    return _iow(0, count * ctypes.sizeof(SpiIocTransfer))
+
+
+SPI_IOC_WR_MODE = _iow(1, 1)
+SPI_IOC_WR_BITS_PER_WORD = _iow(3, 1)
+SPI_IOC_WR_MAX_SPEED_HZ = _iow(4, 4)
+
+
+def _address_of(buf, length: int) -> int:
+    """Адрес памяти буфера buf (bytearray, memoryview, ctypes массив) без копирования"""
+    return ctypes.addressof((ctypes.c_uint8 * length).from_buffer(buf))
+
+
+class _LinuxDevice:
+    """Общая часть адаптеров: открытие файла устройства или готовый дескриптор, функция ioctl."""
+    def __init__(self, path: str, fd: int = None, ioctl_func=None):
+        if ioctl_func is None:
+            if _ioctl is None:
+                raise ImportError("fcntl.ioctl is not available on this platform!")
+            ioctl_func = _ioctl
+        self.ioctl = ioctl_func
+        self._own_fd = fd is None
+        self.fd = os.open(path, os.O_RDWR) if fd is None else fd
+
+    def close(self):
+        """Закрывает файл устройства (если он был открыт адаптером)"""
+        if self._own_fd and self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class LinuxI2cAdapter(_LinuxDevice, I2cAdapter):
+    """Адаптер шины I2C через i2c-dev. bus - номер шины (/dev/i2c-bus) или путь к файлу устройства.
+    fd - уже открытый дескриптор (тогда bus не используется), ioctl_func - замена fcntl.ioctl.
+    Каждый метод - один вызов ioctl I2C_RDWR. Буферы сообщений выделяются один раз.
+
+    I2C adapter on top of i2c-dev. Every method is a single I2C_RDWR ioctl."""
+    def __init__(self, bus: [int, str] = 1, fd: int = None, ioctl_func=None):
+        path = f"/dev/i2c-{bus}" if isinstance(bus, int) else bus
+        _LinuxDevice.__init__(self, path, fd, ioctl_func)
+        I2cAdapter.__init__(self, self.fd)
+        self._msgs = (I2cMsg * 2)()
+        self._data = I2cRdwrData(self._msgs, 0)
+        self._reg = (ctypes.c_uint8 * 1)()  # адрес регистра
+
+    def _set_msg(self, index: int, device_addr: int, flags: int, buf, length: int):
+        msg = self._msgs[index]
+        msg.addr = device_addr
+        msg.flags = flags
+        msg.len = length
+        msg.buf = ctypes.cast(_address_of(buf, length), ctypes.POINTER(ctypes.c_uint8)) if length else None
+
+    def _transfer(self, nmsgs: int):
+        self._data.nmsgs = nmsgs
+        self.ioctl(self.fd, I2C_RDWR, self._data)
+
+    def read_buf_from_mem(self, device_addr: int, mem_addr: int, buf):
+        """Читает из устройства в буфер buf (bytearray), начиная с адреса в устройстве mem_addr:
+        запись адреса и чтение данных одним вызовом ioctl (повторный START между ними)."""
+        self._reg[0] = mem_addr
+        self._set_msg(0, device_addr, 0, self._reg, 1)
+        self._set_msg(1, device_addr, I2C_M_RD, buf, len(buf))
+        self._transfer(2)
+
+    def read_register(self, device_addr: int, reg_addr: int, bytes_count: int) -> bytes:
+        buf = bytearray(bytes_count)
+        self.read_buf_from_mem(device_addr, reg_addr, buf)
+        return bytes(buf)
+
+    def write_buf_to_mem(self, device_addr: int, mem_addr: int, buf):
+        """Записывает все байты buf в устройство, начиная с адреса в устройстве mem_addr, одним сообщением"""
+        data = bytearray(1 + len(buf))
+        data[0] = mem_addr
+        data[1:] = buf
+        self._set_msg(0, device_addr, 0, data, len(data))
+        self._transfer(1)
+
+    def write_register(self, device_addr: int, reg_addr: int, value: [int, bytes, bytearray],
+                       bytes_count: int, byte_order: str):
+        buf = value.to_bytes(bytes_count, byte_order) if isinstance(value, int) else value
+        return self.write_buf_to_mem(device_addr, reg_addr, buf)
+
+    def read(self, device_addr: int, n_bytes: int) -> bytes:
+        buf = bytearray(n_bytes)
+        self._set_msg(0, device_addr, I2C_M_RD, buf, n_bytes)
+        self._transfer(1)
+        return bytes(buf)
+
+    def write(self, device_addr: int, buf: bytes):
+        data = bytearray(buf)
+        self._set_msg(0, device_addr, 0, data, len(data))
+        self._transfer(1)
+
+
+class LinuxSpiAdapter(_LinuxDevice, SpiAdapter):
+    """Адаптер шины SPI через spidev. Выбором кристалла управляет ядро (устройство /dev/spidevBUS.CS), поэтому
+    параметр device_addr методов не используется (в RM3100 передавайте address=None).
+    fd - уже открытый дескриптор, ioctl_func - замена fcntl.ioctl.
+    Каждый метод - один вызов ioctl SPI_IOC_MESSAGE, адрес регистра и данные - в одной посылке.
+
+    SPI adapter on top of spidev. The kernel drives chip select; every method is a single SPI_IOC_MESSAGE."""
+    def __init__(self, bus: int = 0, cs: int = 0, baudrate: int = 1_000_000, mode: int = 0, fd: int = None,
+                 ioctl_func=None):
+        _LinuxDevice.__init__(self, f"/dev/spidev{bus}.{cs}", fd, ioctl_func)
+        SpiAdapter.__init__(self, self.fd)
+        self.baudrate = baudrate
+        self.ioctl(self.fd, SPI_IOC_WR_MODE, bytes((mode,)))
+        self.ioctl(self.fd, SPI_IOC_WR_BITS_PER_WORD, bytes((8,)))
+        self.ioctl(self.fd, SPI_IOC_WR_MAX_SPEED_HZ, baudrate.to_bytes(4, "little"))
+        self._xfers = (SpiIocTransfer * 2)()
+        self._addr = (ctypes.c_uint8 * 1)()     # первый байт посылки (адрес регистра)
+
+    def _set_xfer(self, index: int, tx, rx, length: int):
+        xfer = self._xfers[index]
+        xfer.tx_buf = _address_of(tx, length) if tx is not None else 0
+        xfer.rx_buf = _address_of(rx, length) if rx is not None else 0
+        xfer.len = length
+        xfer.speed_hz = self.baudrate
+        xfer.bits_per_word = 8
+        xfer.cs_change = 0  # chip select не снимается между частями посылки
+
+    def _transfer(self, count: int):
+        self.ioctl(self.fd, spi_ioc_message(count), self._xfers if 2 == count else self._xfers[0])
+
+    def read_buf_from_mem(self, device_addr, mem_addr: int, buf):
+        """Читает из устройства в буфер buf (bytearray), начиная с адреса в устройстве mem_addr, одной посылкой"""
+        self._addr[0] = mem_addr | self.read_flag
+        self._set_xfer(0, self._addr, None, 1)
+        self._set_xfer(1, None, buf, len(buf))
+        self._transfer(2)
+
+    def read_register(self, device_addr, reg_addr: int, bytes_count: int) -> bytes:
+        buf = bytearray(bytes_count)
+        self.read_buf_from_mem(device_addr, reg_addr, buf)
+        return bytes(buf)
+
+    def write_buf_to_mem(self, device_addr, mem_addr: int, buf):
+        """Записывает все байты buf в устройство, начиная с адреса в устройстве mem_addr, одной посылкой"""
+        self._addr[0] = mem_addr & ~self.read_flag & 0xFF
+        data = bytearray(buf)
+        self._set_xfer(0, self._addr, None, 1)
+        self._set_xfer(1, data, None, len(data))
+        self._transfer(2)
+
+    def read(self, device_addr, n_bytes: int) -> bytes:
+        buf = bytearray(n_bytes)
+        self.readinto(device_addr, buf)
+        return bytes(buf)
+
+    def readinto(self, device_addr, buf):
+        self._set_xfer(0, None, buf, len(buf))
+        self._transfer(1)
+
+    def write(self, device_addr, buf: bytes):
+        data = bytearray(buf)
+        self._set_xfer(0, data, None, len(data))
+        self._transfer(1)
+
+    def write_and_read(self, device_addr, wr_buf: bytes, rd_buf: bytes):
+        data = bytearray(wr_buf)
+        self._set_xfer(0, data, rd_buf, len(data))
+        self._transfer(1)
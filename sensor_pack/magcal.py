@@ -0,0 +1,191 @@
+"""
+MIT License
+Copyright (c) 2022 Roman Shevchik
+
+Калибровка магнитометра (компенсация магнитотвердого и магнитомягкого железа) прямо на устройстве.
+Измерения, поступающие от датчика, накапливаются в виде сумм для подбора эллипсоида методом наименьших
+квадратов, поэтому объем памяти не зависит от количества измерений. По запросу (solve) вычисляются
+смещение (hard iron) и матрица 3x3 (soft iron), которые затем применяются к каждому измерению
+в целых числах (формат с фиксированной точкой).
+
+On-device magnetometer calibration (hard and soft iron compensation). Samples are accumulated as least squares
+sums for an ellipsoid fit in constant memory. solve() computes the offset and the 3x3 correction matrix
+that are then applied to each sample using fixed-point integer arithmetic."""
+import array
+import math
+from sensor_pack.compat import micropython
+
+# количество дробных бит элементов матрицы коррекции в формате с фиксированной точкой
+MATRIX_SHIFT = 12
+
+
+def _solve_linear(a: list, b: list) -> list:
+    """Решает систему линейных уравнений a * x = b методом Гаусса с выбором главного элемента.
+    a и b изменяются! Возбуждает ValueError, если матрица вырождена."""
+    n = len(b)
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if 0 == a[pivot][col]:
+            raise ValueError("Singular matrix!")
+        a[col], a[pivot] = a[pivot], a[col]
+        b[col], b[pivot] = b[pivot], b[col]
+        for row in range(col + 1, n):
+            k = a[row][col] / a[col][col]
+            if k:
+                for j in range(col, n):
+                    a[row][j] -= k * a[col][j]
+                b[row] -= k * b[col]
+    x = [0.0] * n
+    for row in range(n - 1, -1, -1):
+        s = b[row] - sum(a[row][j] * x[j] for j in range(row + 1, n))
+        x[row] = s / a[row][row]
+    return x
+
+
+def _eigen_sym3(m: list) -> tuple:
+    """Собственные значения и векторы симметричной матрицы 3x3 методом вращений Якоби.
+    Возвращает кортеж: список собственных значений, матрица собственных векторов (по столбцам)."""
+    a = [row[:] for row in m]
+    v = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    for _ in range(50):
+        off = abs(a[0][1]) + abs(a[0][2]) + abs(a[1][2])
+        if off < 1E-12 * (abs(a[0][0]) + abs(a[1][1]) + abs(a[2][2])):
+            break
+        for p, q in ((0, 1), (0, 2), (1, 2)):
+            if 0 == a[p][q]:
+                continue
+            theta = (a[q][q] - a[p][p]) / (2 * a[p][q])
+            t = (1 if theta >= 0 else -1) / (abs(theta) + math.sqrt(theta * theta + 1))
+            c = 1 / math.sqrt(t * t + 1)
+            s = t * c
+            for k in range(3):     # A = A * J
+                akp, akq = a[k][p], a[k][q]
+                a[k][p] = c * akp - s * akq
+                a[k][q] = s * akp + c * akq
+            for k in range(3):     # A = J^T * A
+                apk, aqk = a[p][k], a[q][k]
+                a[p][k] = c * apk - s * aqk
+                a[q][k] = s * apk + c * aqk
+            for k in range(3):     # V = V * J
+                vkp, vkq = v[k][p], v[k][q]
+                v[k][p] = c * vkp - s * vkq
+                v[k][q] = s * vkp + c * vkq
+    return [a[0][0], a[1][1], a[2][2]], v
+
+
+class MagCalibrator:
+    """Потоковая калибровка магнитометра подбором эллипсоида
+    x^T * Q * x + 2 * v^T * x = 1 (9 неизвестных) методом наименьших квадратов.
+    Хранит только суммы нормальных уравнений (45 + 9 чисел), независимо от количества измерений.
+    Для хорошего результата измерения должны покрывать все направления (вращение датчика во всех плоскостях).
+
+    Streaming magnetometer calibration by an ellipsoid fit. Stores only the normal equation sums."""
+    def __init__(self, scale: float = 0):
+        """scale - масштаб нормировки измерений (примерно модуль поля в отсчетах). Нормировка нужна для точности
+        вычислений с плавающей точкой одинарной точности (большинство портов MicroPython).
+        Если scale равен 0, то берется модуль первого измерения."""
+        self.scale = scale
+        self.reset()
+        # результат калибровки: смещение (отсчеты) и матрица 3x3 (по строкам) в формате с фиксированной точкой
+        self.offset = array.array("i", (0, 0, 0))
+        self.matrix = array.array("i", (1 << MATRIX_SHIFT, 0, 0, 0, 1 << MATRIX_SHIFT, 0, 0, 0, 1 << MATRIX_SHIFT))
+        # модуль поля после коррекции (отсчеты)
+        self.radius = 0.0
+
+    def reset(self):
+        """Удаляет накопленные суммы. Результат последней калибровки сохраняется."""
+        self._ata = [0.0] * 45  # верхний треугольник матрицы A^T * A (9x9), по строкам
+        self._atb = [0.0] * 9   # A^T * b, b - столбец единиц
+        self._count = 0
+        self._norm = 1 / self.scale if self.scale else 0.0
+
+    def __len__(self) -> int:
+        """Возвращает количество накопленных измерений"""
+        return self._count
+
+    def put(self, x: int, y: int, z: int):
+        """Добавляет измерение (в отсчетах) к суммам"""
+        if not self._norm:
+            mag = math.sqrt(x * x + y * y + z * z)
+            if 0 == mag:
+                return
+            self._norm = 1 / mag
+        k = self._norm
+        x, y, z = k * x, k * y, k * z
+        d = (x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z)
+        ata = self._ata
+        atb = self._atb
+        index = 0
+        for i in range(9):
+            di = d[i]
+            atb[i] += di
+            for j in range(i, 9):
+                ata[index] += di * d[j]
+                index += 1
+        self._count += 1
+
+    def put_block(self, samples, count: int = 0):
+        """Добавляет count измерений из массива samples (x0, y0, z0, x1, ...). 0 - весь массив."""
+        if count <= 0:
+            count = len(samples) // 3
+        for index in range(0, 3 * count, 3):
+            self.put(samples[index], samples[index + 1], samples[index + 2])
+
+    def solve(self):
+        """Подбирает эллипсоид по накопленным суммам и вычисляет смещение self.offset, матрицу коррекции
+        self.matrix и модуль поля self.radius. Возбуждает ValueError, если измерений мало или они не позволяют
+        подобрать эллипсоид (например, датчик не вращали)."""
+        if self._count < 9:
+            raise ValueError(f"Not enough samples: {self._count}")
+        # полная симметричная матрица из верхнего треугольника
+        a = [[0.0] * 9 for _ in range(9)]
+        index = 0
+        for i in range(9):
+            for j in range(i, 9):
+                a[i][j] = a[j][i] = self._ata[index]
+                index += 1
+        p = _solve_linear(a, self._atb[:])
+        q = [[p[0], p[3], p[4]], [p[3], p[1], p[5]], [p[4], p[5], p[2]]]
+        # центр эллипсоида: Q * c = -v
+        center = _solve_linear([row[:] for row in q], [-p[6], -p[7], -p[8]])
+        # (x - c)^T * Q * (x - c) = 1 + c^T * Q * c
+        k = 1 + sum(center[i] * q[i][j] * center[j] for i in range(3) for j in range(3))
+        values, vectors = _eigen_sym3([[q[i][j] / k for j in range(3)] for i in range(3)])
+        if min(values) <= 0:
+            raise ValueError("Samples do not fit an ellipsoid!")
+        # радиус сферы с тем же объемом, что и эллипсоид (нормированные единицы)
+        radius = 1 / math.sqrt(math.sqrt(values[0] * values[1] * values[2]) ** (2 / 3))
+        # матрица коррекции: radius * Q^(1/2), переводит эллипсоид в сферу радиуса radius
+        w = [math.sqrt(val) * radius for val in values]
+        scale = 1 << MATRIX_SHIFT
+        for i in range(3):
+            for j in range(3):
+                m = sum(vectors[i][n] * w[n] * vectors[j][n] for n in range(3))
+                self.matrix[3 * i + j] = int(m * scale + (0.5 if m >= 0 else -0.5))
+            self.offset[i] = int(center[i] / self._norm + (0.5 if center[i] >= 0 else -0.5))
+        self.radius = radius / self._norm
+
+    @micropython.native
+    def apply(self, samples, out, index: int = 0):
+        """Применяет калибровку к измерению samples[index], samples[index + 1], samples[index + 2]
+        и записывает результат в out[index].. out[index + 2] (out может быть тем же массивом).
+        Только целочисленная арифметика."""
+        off = self.offset
+        m = self.matrix
+        rnd = 1 << (MATRIX_SHIFT - 1)
+        x = samples[index] - off[0]
+        y = samples[index + 1] - off[1]
+        z = samples[index + 2] - off[2]
+        out[index] = (m[0] * x + m[1] * y + m[2] * z + rnd) >> MATRIX_SHIFT
+        out[index + 1] = (m[3] * x + m[4] * y + m[5] * z + rnd) >> MATRIX_SHIFT
+        out[index + 2] = (m[6] * x + m[7] * y + m[8] * z + rnd) >> MATRIX_SHIFT
+
+    def apply_into(self, samples, out, count: int = 0) -> int:
+        """Применяет калибровку к count измерениям массива samples (x0, y0, z0, x1, ...) и записывает
+        результаты в out (может быть тем же массивом). 0 - весь массив. Возвращает количество измерений."""
+        if count <= 0:
+            count = len(samples) // 3
+        apply = self.apply
+        for index in range(0, 3 * count, 3):
+            apply(samples, out, index)
+        return count
@@ -0,0 +1,186 @@
+"""
+MIT License
+Copyright (c) 2022 Roman Shevchik
+
+Кольцевые буферы на основе array. Один писатель (например, обработчик прерывания,
+запланированный micropython.schedule) и один читатель (основной цикл программы).
+Ring buffers backed by arrays. One writer (for example, an interrupt handler
+scheduled by micropython.schedule) and one reader (the main program loop)."""
+import array
+from sensor_pack.compat import micropython, ticks_diff
+
+
+class _Ring:
+    """Индексы головы и хвоста кольцевого буфера на capacity записей.
+    Писатель изменяет только индекс головы, читатель - только индекс хвоста, поэтому буфер не требует
+    запрета прерываний. При заполнении новые записи отбрасываются, а счетчик overflows увеличивается.
+    The writer changes only the head index, the reader changes only the tail index.
+    When the buffer is full, new records are discarded and the overflows counter is incremented."""
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"Invalid capacity: {capacity}")
+        self._slots = 1 + capacity     # одна запись всегда свободна, чтобы отличать полный буфер от пустого
+        self._head = 0  # номер записи, в которую будет писать писатель
+        self._tail = 0  # номер записи, которую прочитает читатель
+        self.overflows = 0
+
+    def __len__(self) -> int:
+        """Возвращает количество записей в буфере"""
+        n = self._head - self._tail
+        return n + self._slots if n < 0 else n
+
+    def get_capacity(self) -> int:
+        return self._slots - 1
+
+    @micropython.native
+    def _reserve_slot(self) -> int:
+        """Возвращает номер свободной записи или -1, если буфер полон"""
+        nxt = self._head + 1
+        if nxt == self._slots:
+            nxt = 0
+        if nxt == self._tail:
+            self.overflows += 1
+            return -1
+        return self._head
+
+    @micropython.native
+    def commit(self):
+        """Для писателя. Делает запись, полученную методом reserve, доступной читателю."""
+        nxt = self._head + 1
+        self._head = 0 if nxt == self._slots else nxt
+
+    def clear(self):
+        """Для читателя. Отбрасывает все записи."""
+        self._tail = self._head
+
+
+class RingBuffer(_Ring):
+    """Кольцевой буфер записей фиксированной длины (width элементов) в одном массиве.
+    Ring buffer of fixed-width records (width elements) in a single array."""
+    def __init__(self, capacity: int, width: int = 3, type_code: str = "i"):
+        """capacity - количество записей; width - количество элементов в записи; type_code - тип элементов.
+        capacity - number of records; width - number of elements in a record; type_code - element type."""
+        if width < 1:
+            raise ValueError(f"Invalid width: {width}")
+        super().__init__(capacity)
+        self.width = width
+        self.data = array.array(type_code, (0 for _ in range(width * self._slots)))
+
+    @micropython.native
+    def reserve(self) -> int:
+        """Для писателя. Возвращает индекс первого элемента свободной записи в self.data или -1, если буфер полон.
+        Запись становится доступной читателю только после вызова commit."""
+        slot = self._reserve_slot()
+        return slot if slot < 0 else self.width * slot
+
+    def put(self, record) -> bool:
+        """Для писателя. Добавляет запись из последовательности record. Возвращает Ложь, если буфер полон."""
+        index = self.reserve()
+        if index < 0:
+            return False
+        data = self.data
+        for i in range(self.width):
+            data[index + i] = record[i]
+        self.commit()
+        return True
+
+    @micropython.native
+    def get_into(self, out, max_count: int = 0) -> int:
+        """Для читателя. Переносит записи из буфера в массив out (подряд, начиная с нулевого элемента).
+        Переносит не более max_count записей (0 - сколько поместится в out).
+        Возвращает количество перенесенных записей.
+        For reader. Moves records from the buffer to out. Returns the number of moved records."""
+        width = self.width
+        limit = len(out) // width
+        if 0 < max_count < limit:
+            limit = max_count
+        data = self.data
+        slots = self._slots
+        tail = self._tail
+        head = self._head   # голова читается один раз, писатель может изменить ее в любой момент
+        count = 0
+        while tail != head and count < limit:
+            src = width * tail
+            dst = width * count
+            for i in range(width):
+                out[dst + i] = data[src + i]
+            tail += 1
+            if tail == slots:
+                tail = 0
+            count += 1
+        self._tail = tail
+        return count
+
+
+class SampleBuffer(_Ring):
+    """Кольцевой буфер измерений по трем осям с метками времени в виде структуры массивов:
+    x, y, z - array('i'), ticks - array('I') (значения ticks_us() в момент получения измерения).
+    16 байт на измерение вместо ~100 байт для кортежа из четырех int.
+    Ring buffer of three-axis samples with timestamps as a structure of arrays, 16 bytes per sample."""
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        slots = self._slots
+        self.x = array.array("i", (0 for _ in range(slots)))
+        self.y = array.array("i", (0 for _ in range(slots)))
+        self.z = array.array("i", (0 for _ in range(slots)))
+        self.ticks = array.array("I", (0 for _ in range(slots)))
+
+    @micropython.native
+    def reserve(self) -> int:
+        """Для писателя. Возвращает номер свободной записи (индекс в x, y, z, ticks) или -1, если буфер полон.
+        Запись становится доступной читателю только после вызова commit."""
+        return self._reserve_slot()
+
+    @micropython.native
+    def put(self, x: int, y: int, z: int, ticks: int) -> bool:
+        """Для писателя. Добавляет измерение. Возвращает Ложь, если буфер полон."""
+        slot = self._reserve_slot()
+        if slot < 0:
+            return False
+        self.x[slot] = x
+        self.y[slot] = y
+        self.z[slot] = z
+        self.ticks[slot] = ticks
+        self.commit()
+        return True
+
+    @micropython.native
+    def get_into(self, samples, ticks=None, max_count: int = 0) -> int:
+        """Для читателя. Переносит измерения в массив samples (x0, y0, z0, x1, y1, z1, ...), а их метки времени
+        в массив ticks (если не None). Переносит не более max_count измерений (0 - сколько поместится).
+        Возвращает количество перенесенных измерений."""
+        limit = len(samples) // 3
+        if ticks is not None and len(ticks) < limit:
+            limit = len(ticks)
+        if 0 < max_count < limit:
+            limit = max_count
+        x, y, z, t = self.x, self.y, self.z, self.ticks
+        slots = self._slots
+        tail = self._tail
+        head = self._head   # голова читается один раз, писатель может изменить ее в любой момент
+        count = 0
+        while tail != head and count < limit:
+            dst = 3 * count
+            samples[dst] = x[tail]
+            samples[dst + 1] = y[tail]
+            samples[dst + 2] = z[tail]
+            if ticks is not None:
+                ticks[count] = t[tail]
+            tail += 1
+            if tail == slots:
+                tail = 0
+            count += 1
+        self._tail = tail
+        return count
+
+
+@micropython.native
+def get_intervals(ticks, out, count: int) -> int:
+    """Вычисляет интервалы (мкс) между соседними метками времени ticks с учетом переполнения счетчика
+    ticks_us(): out[i] = ticks_diff(ticks[i + 1], ticks[i]) для i в диапазоне 0..count - 2.
+    Возвращает количество интервалов.
+    Computes wraparound-safe intervals between adjacent timestamps."""
+    n = count - 1
+    for i in range(n):
+        out[i] = ticks_diff(ticks[i + 1], ticks[i])
+    return n if n > 0 else 0
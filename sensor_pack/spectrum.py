@@ -0,0 +1,198 @@
+"""
+MIT License
+Copyright (c) 2022 Roman Shevchik
+
+Спектральный анализ потока измерений блоками (окно Ханна, БПФ по каждому каналу) и скользящие оценки мощности
+в полосах частот, например помех от сети 50/60 Гц или от двигателей. Позволяет обнаруживать помеху на самом
+устройстве, не передавая исходные измерения.
+БПФ: NumPy на CPython, ulab на MicroPython (если есть в прошивке), иначе - на чистом Python (медленно).
+
+Block spectral analysis of a measurement stream (Hann window, FFT per channel) with rolling band power
+estimates, for example 50/60 Hz power-line interference. FFT backend: NumPy, ulab or pure Python."""
+import array
+import math
+
+try:
+    import numpy
+    backend = "numpy"
+except ImportError:
+    try:
+        from ulab import numpy
+        backend = "ulab"
+    except ImportError:
+        numpy = None
+        backend = "python"
+
+# полосы по умолчанию (Гц): сеть 50 Гц и сеть 60 Гц
+MAINS_BANDS = ((45.0, 55.0), (55.0, 65.0))
+
+
+class _PyFft:
+    """БПФ по основанию 2 на чистом Python. Таблицы перестановки и поворачивающих множителей вычисляются один раз."""
+    def __init__(self, size: int):
+        self.size = size
+        bits = 0
+        while (1 << bits) < size:
+            bits += 1
+        rev = []
+        for i in range(size):
+            r = 0
+            for b in range(bits):
+                r = (r << 1) | ((i >> b) & 1)
+            rev.append(r)
+        self._rev = rev
+        half = size // 2
+        self._cos = [math.cos(2 * math.pi * k / size) for k in range(half)]
+        self._sin = [-math.sin(2 * math.pi * k / size) for k in range(half)]
+
+    def power(self, values) -> list:
+        """Возвращает |X[k]|**2 для k = 0..size // 2 по вещественным значениям values"""
+        n = self.size
+        rev = self._rev
+        re = [values[rev[i]] for i in range(n)]
+        im = [0.0] * n
+        cos_t, sin_t = self._cos, self._sin
+        length = 2
+        while length <= n:
+            half = length >> 1
+            step = n // length
+            for start in range(0, n, length):
+                k = 0
+                for j in range(start, start + half):
+                    wr, wi = cos_t[k], sin_t[k]
+                    m = j + half
+                    tr = wr * re[m] - wi * im[m]
+                    ti = wr * im[m] + wi * re[m]
+                    re[m], im[m] = re[j] - tr, im[j] - ti
+                    re[j] += tr
+                    im[j] += ti
+                    k += step
+            length <<= 1
+        return [re[k] * re[k] + im[k] * im[k] for k in range(n // 2 + 1)]
+
+
+def _power_ndarray(values):
+    """|X[k]|**2 для k = 0..N // 2 средствами NumPy или ulab"""
+    if "numpy" == backend:
+        spectrum = numpy.fft.rfft(values)
+        return spectrum.real ** 2 + spectrum.imag ** 2
+    result = numpy.fft.fft(values)
+    if isinstance(result, tuple):  # ulab без поддержки комплексных чисел: (re, im)
+        re, im = result
+    else:
+        re, im = numpy.real(result), numpy.imag(result)
+    half = 1 + len(values) // 2
+    return re[:half] * re[:half] + im[:half] * im[:half]
+
+
+class SpectrumAnalyzer:
+    """Накапливает кадры (каналы чередуются: x0, y0, z0, x1, ...) в блок из size кадров. По заполнении блока для
+    каждого канала вычисляет спектр мощности (без постоянной составляющей, окно Ханна) и обновляет скользящие
+    (экспоненциальное среднее с коэффициентом smoothing) оценки мощности в полосах bands и полной мощности.
+    Мощность - в квадратах единиц входных значений, нормирована так, что сумма по всем частотам равна дисперсии.
+
+    Accumulates frames into blocks of size frames and keeps rolling band power estimates per channel."""
+    def __init__(self, sample_rate: float, size: int = 256, channels: int = 3, bands: tuple = MAINS_BANDS,
+                 smoothing: float = 0.25):
+        """sample_rate - частота измерений (Гц); size - длина блока (степень двойки);
+        bands - полосы частот (нижняя, верхняя граница в Гц); smoothing - коэффициент сглаживания 0..1
+        (1 - только последний блок)."""
+        if size < 4 or size & (size - 1):
+            raise ValueError(f"Block size must be a power of two: {size}")
+        if channels < 1:
+            raise ValueError(f"Invalid channels value: {channels}")
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"Invalid smoothing value: {smoothing}")
+        self.sample_rate = sample_rate
+        self.size = size
+        self.channels = channels
+        self.bands = tuple(bands)
+        self.smoothing = smoothing
+        self._block = array.array("i", (0 for _ in range(size * channels)))
+        self._count = 0     # количество кадров в блоке
+        self.blocks = 0     # количество проанализированных блоков
+        window = [0.5 - 0.5 * math.cos(2 * math.pi * n / size) for n in range(size)]
+        # нормировка: сумма мощностей по частотам равна средней мощности (дисперсии) сигнала
+        self._norm = 2 / (size * sum(w * w for w in window))
+        self._window = window if numpy is None else numpy.array(window)
+        self._fft = _PyFft(size) if numpy is None else None
+        # номера элементов спектра каждой полосы
+        resolution = sample_rate / size
+        self._band_bins = tuple(tuple(k for k in range(1, size // 2 + 1) if lo <= k * resolution < hi)
+                                for lo, hi in self.bands)
+        # скользящие оценки: [полоса][канал] и полная мощность [канал]
+        self.band_power = [[0.0] * channels for _ in self.bands]
+        self.total_power = [0.0] * channels
+        # спектр мощности последнего блока по каждому каналу (для отладки)
+        self.last_power = [None] * channels
+
+    def get_resolution(self) -> float:
+        """Возвращает разрешение по частоте (Гц)"""
+        return self.sample_rate / self.size
+
+    def put(self, sample, offset: int = 0) -> bool:
+        """Добавляет кадр sample[offset], sample[offset + 1], ... Возвращает Истина, если блок заполнен
+        и оценки мощности обновлены."""
+        ch = self.channels
+        block = self._block
+        dst = self._count * ch
+        for i in range(ch):
+            block[dst + i] = sample[offset + i]
+        self._count += 1
+        if self._count < self.size:
+            return False
+        self._count = 0
+        self._analyze()
+        return True
+
+    def put_block(self, samples, count: int = 0) -> int:
+        """Добавляет count кадров из массива samples (0 - весь массив). Возвращает количество
+        проанализированных блоков."""
+        ch = self.channels
+        if count <= 0:
+            count = len(samples) // ch
+        result = 0
+        for index in range(0, ch * count, ch):
+            if self.put(samples, index):
+                result += 1
+        return result
+
+    def _get_power(self, channel: int):
+        """Спектр мощности блока по каналу channel"""
+        ch = self.channels
+        size = self.size
+        block = self._block
+        values = [block[i * ch + channel] for i in range(size)]
+        mean = sum(values) / size
+        window = self._window
+        norm = self._norm
+        if numpy is None:
+            return [p * norm for p in self._fft.power([(values[i] - mean) * window[i] for i in range(size)])]
+        return _power_ndarray((numpy.array(values) - mean) * window) * norm
+
+    def _analyze(self):
+        alpha = self.smoothing
+        first = 0 == self.blocks
+        for c in range(self.channels):
+            power = self._get_power(c)
+            self.last_power[c] = power
+            total = float(sum(power[1:]))
+            self.total_power[c] = total if first else self.total_power[c] + alpha * (total - self.total_power[c])
+            for b, bins in enumerate(self._band_bins):
+                value = float(sum(power[k] for k in bins))
+                est = self.band_power[b]
+                est[c] = value if first else est[c] + alpha * (value - est[c])
+        self.blocks += 1
+
+    def get_band_ratio(self, band: int) -> float:
+        """Возвращает наибольшую по каналам долю мощности в полосе номер band от полной мощности"""
+        result = 0.0
+        for c in range(self.channels):
+            total = self.total_power[c]
+            if total > 0:
+                result = max(result, self.band_power[band][c] / total)
+        return result
+
+    def is_interference(self, threshold: float = 0.2) -> bool:
+        """Возвращает Истина, если доля мощности хотя бы в одной полосе превышает threshold"""
+        return any(self.get_band_ratio(b) > threshold for b in range(len(self.bands)))